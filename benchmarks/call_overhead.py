@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the cost per call of patched attributes compared to their originals.
+
+The shapes measured are the plain replacement of a method, the replacements
+calling the original either through ``get_original_attribute()`` or through
+an ``__original__`` parameter, the class method, static method, and property
+patches, and stacks of patches calling each other down to the original.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+    unicode_literals,
+)
+
+import argparse
+import os
+import sys
+import timeit
+
+_HERE = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(_HERE, os.pardir)))
+
+import gorilla
+
+
+_SETTINGS = gorilla.Settings(allow_hit=True)
+
+
+def _make_class():
+    class Class(object):
+
+        def method(self):
+            return 1
+
+        @classmethod
+        def class_method(cls):
+            return 1
+
+        @staticmethod
+        def static_method():
+            return 1
+
+        @property
+        def value(self):
+            return 1
+
+    return Class
+
+
+def _apply(cls, name, obj, id='default'):
+    gorilla.apply(gorilla.Patch(cls, name, obj, settings=_SETTINGS), id=id)
+
+
+def _method_replacement():
+    cls = _make_class()
+
+    def method(self):
+        return 1
+
+    _apply(cls, 'method', method)
+    return cls
+
+
+def _method_lookup():
+    cls = _make_class()
+
+    def method(self):
+        return gorilla.get_original_attribute(cls, 'method')(self)
+
+    _apply(cls, 'method', method)
+    return cls
+
+
+def _method_call_through():
+    cls = _make_class()
+
+    def method(self, __original__=None):
+        return __original__(self)
+
+    _apply(cls, 'method', method)
+    return cls
+
+
+def _class_method_lookup():
+    cls = _make_class()
+
+    @classmethod
+    def class_method(cls_):
+        return gorilla.get_original_attribute(cls_, 'class_method')()
+
+    _apply(cls, 'class_method', class_method)
+    return cls
+
+
+def _class_method_call_through():
+    cls = _make_class()
+
+    @classmethod
+    def class_method(cls_, __original__=None):
+        return __original__(cls_)
+
+    _apply(cls, 'class_method', class_method)
+    return cls
+
+
+def _static_method_lookup():
+    cls = _make_class()
+
+    @staticmethod
+    def static_method():
+        return gorilla.get_original_attribute(cls, 'static_method')()
+
+    _apply(cls, 'static_method', static_method)
+    return cls
+
+
+def _static_method_call_through():
+    cls = _make_class()
+
+    @staticmethod
+    def static_method(__original__=None):
+        return __original__()
+
+    _apply(cls, 'static_method', static_method)
+    return cls
+
+
+def _property_lookup():
+    cls = _make_class()
+
+    @property
+    def value(self):
+        return gorilla.get_original_attribute(cls, 'value').__get__(self)
+
+    _apply(cls, 'value', value)
+    return cls
+
+
+def _stack_lookup(depth):
+    def factory():
+        cls = _make_class()
+        for i in range(depth):
+            def method(self, id=str(i)):
+                return gorilla.get_original_attribute(cls, 'method',
+                                                      id=id)(self)
+
+            _apply(cls, 'method', method, id=str(i))
+
+        return cls
+
+    return factory
+
+
+def _stack_call_through(depth):
+    def factory():
+        cls = _make_class()
+        for _ in range(depth):
+            def method(self, __original__=None):
+                return __original__(self)
+
+            _apply(cls, 'method', method)
+
+        return cls
+
+    return factory
+
+
+def _call(name):
+    return {
+        'method': lambda instance: instance.method,
+        'class_method': lambda instance: type(instance).class_method,
+        'static_method': lambda instance: type(instance).static_method,
+        'value': lambda instance: lambda: instance.value,
+    }[name]
+
+
+def _get_cases(depth):
+    stack = 'stack of {}'.format(depth)
+    return [
+        ('method', [
+            ('original', _make_class),
+            ('replacement', _method_replacement),
+            ('get_original_attribute', _method_lookup),
+            ('__original__', _method_call_through),
+        ]),
+        ('class_method', [
+            ('original', _make_class),
+            ('get_original_attribute', _class_method_lookup),
+            ('__original__', _class_method_call_through),
+        ]),
+        ('static_method', [
+            ('original', _make_class),
+            ('get_original_attribute', _static_method_lookup),
+            ('__original__', _static_method_call_through),
+        ]),
+        ('value', [
+            ('original', _make_class),
+            ('get_original_attribute', _property_lookup),
+        ]),
+        ('method', [
+            ('original', _make_class),
+            ('{}, get_original_attribute'.format(stack), _stack_lookup(depth)),
+            ('{}, __original__'.format(stack), _stack_call_through(depth)),
+        ]),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--depth', type=int, default=10,
+                        help='depth of the stacks of patches')
+    parser.add_argument('--number', type=int, default=100000,
+                        help='number of calls per measurement')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of measurements to take the best of')
+    args = parser.parse_args()
+
+    for name, shapes in _get_cases(args.depth):
+        reference = None
+        for label, factory in shapes:
+            function = _call(name)(factory()())
+            timing = min(timeit.repeat(function, number=args.number,
+                                       repeat=args.repeat))
+            timing = timing / args.number * 1e9
+            if reference is None:
+                reference = timing
+
+            print("{:<14} {:<40} {:8.1f} ns/call {:+8.1f} ns".format(
+                name, label, timing, timing - reference))
+
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the cost of retrieving attributes with ``get_attribute()``."""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+    unicode_literals,
+)
+
+import argparse
+import inspect
+import os
+import sys
+import timeit
+import types
+
+_HERE = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(_HERE, os.pardir)))
+
+import gorilla
+
+
+def _make_class(depth):
+    cls = type(str('Class0'), (object,), {'hit': 1})
+    for i in range(1, depth):
+        cls = type(str('Class{}'.format(i)), (cls,), {})
+
+    return cls
+
+
+def _make_module():
+    module = types.ModuleType(str('module'))
+    module.hit = 1
+    return module
+
+
+def _get_attribute_with_exceptions(obj, name):
+    # Former implementation, trying each object of the lookup chain in turn.
+    objs = inspect.getmro(obj) if isinstance(obj, type) else [obj]
+    for obj_ in objs:
+        try:
+            return object.__getattribute__(obj_, name)
+        except AttributeError:
+            pass
+
+    raise AttributeError("'{}' object has no attribute '{}'"
+                         .format(type(obj), name))
+
+
+def _lookup(function, obj, name):
+    def lookup():
+        try:
+            function(obj, name)
+        except AttributeError:
+            pass
+
+    return lookup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--depth', type=int, default=5,
+                        help='depth of the class hierarchy')
+    parser.add_argument('--number', type=int, default=100000,
+                        help='number of lookups per measurement')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of measurements to take the best of')
+    args = parser.parse_args()
+
+    objs = (('class', _make_class(args.depth)), ('module', _make_module()))
+    functions = (('get_attribute', gorilla.get_attribute),
+                 ('with exceptions', _get_attribute_with_exceptions))
+    for obj_label, obj in objs:
+        for name in ('hit', 'miss'):
+            for function_label, function in functions:
+                timing = min(timeit.repeat(_lookup(function, obj, name),
+                                           number=args.number,
+                                           repeat=args.repeat))
+                print("{:<6} {:<4} {:<16} {:8.1f} ns/call".format(
+                    obj_label, name, function_label,
+                    timing / args.number * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the memory footprint of the patches created for a large class."""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+    unicode_literals,
+)
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+_HERE = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(_HERE, os.pardir)))
+
+import gorilla
+
+
+def _make_class(count):
+    def method(self):
+        return 1
+
+    members = {'method_{}'.format(i): method for i in range(count)}
+    return type(str('Class'), (object,), members)
+
+
+def _measure(function):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        out = function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return (out, current, peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=50000,
+                        help='number of members in the class')
+    args = parser.parse_args()
+
+    destination = _make_class(0)
+    source = _make_class(args.count)
+    settings = gorilla.Settings(allow_hit=True)
+
+    def create_patches():
+        return gorilla.create_patches(destination, source, settings=settings,
+                                      filter=None, use_decorators=False)
+
+    def create_patch_objects():
+        return [gorilla.Patch(destination, name, value,
+                              settings=gorilla.Settings(allow_hit=True))
+                for name, value in sorted(vars(source).items())]
+
+    for label, function in (('create_patches', create_patches),
+                            ('Patch + Settings', create_patch_objects)):
+        patches, current, peak = _measure(function)
+        count = len(patches)
+        print("{:<18} {:8.1f} B/patch retained, {:8.1f} B/patch peak"
+              .format(label, current / count, peak / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the cold start cost of ``find_patches()`` over generated packages.
+
+Each measurement runs in a fresh interpreter so that ``sys.modules`` starts out
+clean, after a first run that warms up the bytecode and file system caches.
+The wall time of ``find_patches()`` is reported along with the number of
+modules that it imported.
+
+The package trees generated are:
+
+- flat: a single package with many modules;
+- nested: a chain of nested subpackages, each with a few modules;
+- namespace: a package split into several portions, each in its own directory
+  and extending the ``__path__`` attribute of the package.
+
+Only one module out of ``--ratio`` defines patches, the others are plain.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+    unicode_literals,
+)
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+_HERE = os.path.abspath(os.path.dirname(__file__))
+_ROOT = os.path.abspath(os.path.join(_HERE, os.pardir))
+
+_PLAIN_MODULE = '''def function():
+    pass
+'''
+
+_PATCH_MODULE = '''import gorilla
+
+
+class Destination(object):
+    pass
+
+
+@gorilla.patch(Destination)
+def function():
+    pass
+
+
+@gorilla.patches(Destination)
+class Class(object):
+
+    def method(self):
+        pass
+'''
+
+_NAMESPACE_INIT = '''import pkgutil
+
+__path__ = pkgutil.extend_path(__path__, __name__)
+'''
+
+_CHILD = '''
+import json
+import sys
+import timeit
+
+config = json.loads(sys.argv[1])
+sys.path[:0] = config['paths']
+
+import gorilla
+
+package = __import__(config['package'])
+count = len(sys.modules)
+start = timeit.default_timer()
+patches = gorilla.find_patches([package], **config['options'])
+duration = timeit.default_timer() - start
+print(json.dumps({
+    'time': duration,
+    'imports': len(sys.modules) - count,
+    'patches': len(patches),
+}))
+'''
+
+
+def _write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _mkdir(root, name):
+    path = os.path.join(root, name)
+    os.mkdir(path)
+    return path
+
+
+def _write_modules(path, start, count, ratio):
+    for i in range(start, start + count):
+        content = _PATCH_MODULE if i % ratio == 0 else _PLAIN_MODULE
+        _write(os.path.join(path, 'module_{}.py'.format(i)), content)
+
+
+def _make_flat(root, args):
+    path = os.path.join(root, 'flat')
+    os.mkdir(path)
+    _write(os.path.join(path, '__init__.py'), '')
+    _write_modules(path, 0, args.flat, args.ratio)
+    return ([root], 'flat')
+
+
+def _make_nested(root, args):
+    path = root
+    for i in range(args.depth):
+        name = 'nested' if i == 0 else 'level_{}'.format(i)
+        path = os.path.join(path, name)
+        os.mkdir(path)
+        _write(os.path.join(path, '__init__.py'), '')
+        _write_modules(path, i * args.width, args.width, args.ratio)
+
+    return ([root], 'nested')
+
+
+def _make_namespace(root, args):
+    paths = []
+    for i in range(args.portions):
+        portion = os.path.join(root, 'portion_{}'.format(i))
+        path = os.path.join(portion, 'namespace')
+        os.makedirs(path)
+        _write(os.path.join(path, '__init__.py'), _NAMESPACE_INIT)
+        _write_modules(path, i * args.width, args.width, args.ratio)
+        paths.append(portion)
+
+    return (paths, 'namespace')
+
+
+_SHAPES = [
+    ('flat', _make_flat),
+    ('nested', _make_nested),
+    ('namespace', _make_namespace),
+]
+
+_MODES = {
+    'default': {},
+    'static': {'static': True},
+    'cache': {'cache': None},
+    'workers': {'workers': 8},
+}
+
+
+def _run(paths, package, options):
+    config = {'paths': [_ROOT] + paths, 'package': package,
+              'options': options}
+    output = subprocess.check_output(
+        [sys.executable, '-c', _CHILD, json.dumps(config)])
+    return json.loads(output.decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--flat', type=int, default=1000,
+                        help='number of modules in the flat package')
+    parser.add_argument('--depth', type=int, default=20,
+                        help='number of nested packages')
+    parser.add_argument('--portions', type=int, default=4,
+                        help='number of portions of the namespace package')
+    parser.add_argument('--width', type=int, default=25,
+                        help='number of modules per nested package or portion')
+    parser.add_argument('--ratio', type=int, default=10,
+                        help='one module out of this many defines patches')
+    parser.add_argument('--mode', action='append', choices=sorted(_MODES),
+                        help='discovery mode to measure, default only if '
+                             'omitted')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of measurements to take the best of')
+    args = parser.parse_args()
+
+    modes = args.mode or ['default']
+    root = tempfile.mkdtemp()
+    try:
+        print("{:<10} {:<9} {:<8} {:>10} {:>8} {:>8}".format(
+            'shape', 'recursive', 'mode', 'time', 'imports', 'patches'))
+        for shape, factory in _SHAPES:
+            paths, package = factory(_mkdir(root, shape), args)
+            for recursive in (True, False):
+                for mode in modes:
+                    options = dict(_MODES[mode], recursive=recursive)
+                    if 'cache' in options:
+                        options['cache'] = os.path.join(
+                            root, '{}-{}.json'.format(shape, recursive))
+
+                    _run(paths, package, options)
+                    results = [_run(paths, package, options)
+                               for _ in range(args.repeat)]
+                    best = min(results, key=lambda result: result['time'])
+                    print("{:<10} {:<9} {:<8} {:>7.1f} ms {:>8} {:>8}".format(
+                        shape, str(recursive), mode, best['time'] * 1e3,
+                        best['imports'], best['patches']))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,450 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Time the main operations at scale and compare them against a baseline.
+
+The fixtures are synthetic: a module with thousands of functions, a deep class
+hierarchy, a deep stack of patches, and a package generated on disk. The
+timings are the best of several runs while the memory is the peak allocated
+during a single run, as traced by ``tracemalloc``.
+
+Use ``--save`` to store the results as a baseline and ``--compare`` to report
+the regressions against it. Baselines are specific to a machine and are not
+meant to be committed.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+    unicode_literals,
+)
+
+import argparse
+import gc
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+import types
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+_HERE = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(_HERE, os.pardir)))
+
+import gorilla
+
+
+_BASELINE_VERSION = 1
+
+_PACKAGE = 'gorilla_benchmark_package'
+
+_MODULE_TEMPLATE = '''import gorilla
+
+
+class Destination(object):
+    pass
+'''
+
+_PATCH_TEMPLATE = '''
+
+@gorilla.patch(Destination)
+def function_{index}():
+    pass
+'''
+
+
+def _make_module(name, count):
+    module = types.ModuleType(str(name))
+    for i in range(count):
+        def function():
+            pass
+
+        setattr(module, 'function_{}'.format(i), function)
+
+    return module
+
+
+def _make_hierarchy(depth, count):
+    classes = []
+    cls = object
+    for i in range(depth):
+        members = {'method_{}_{}'.format(i, j): lambda self: None
+                   for j in range(count)}
+        cls = type(str('Class{}'.format(i)), (cls,), members)
+        classes.append(cls)
+
+    return classes
+
+
+def _make_package(root, count, functions):
+    path = os.path.join(root, _PACKAGE)
+    os.mkdir(path)
+    with open(os.path.join(path, '__init__.py'), 'w') as f:
+        f.write('')
+
+    for i in range(count):
+        content = _MODULE_TEMPLATE + ''.join(
+            _PATCH_TEMPLATE.format(index=j) for j in range(functions))
+        with open(os.path.join(path, 'module_{}.py'.format(i)), 'w') as f:
+            f.write(content)
+
+
+def _get_module_patches(destination, source, settings=None):
+    return [gorilla.Patch(destination, name, value, settings=settings)
+            for name, value in sorted(vars(source).items())
+            if name.startswith('function_')]
+
+
+def _bench_apply(args):
+    source = _make_module('source', args.functions)
+
+    def setup():
+        destination = types.ModuleType(str('destination'))
+        return _get_module_patches(destination, source)
+
+    def run(patches):
+        for patch in patches:
+            gorilla.apply(patch)
+
+    return (setup, run)
+
+
+def _bench_check(args):
+    source = _make_module('source', args.functions)
+
+    def setup():
+        destination = types.ModuleType(str('destination'))
+        return _get_module_patches(destination, source)
+
+    def run(patches):
+        gorilla.check(patches)
+
+    return (setup, run)
+
+
+def _bench_revert(args):
+    source = _make_module('source', args.functions)
+
+    def setup():
+        destination = types.ModuleType(str('destination'))
+        patches = _get_module_patches(destination, source)
+        for patch in patches:
+            gorilla.apply(patch)
+
+        return patches
+
+    def run(patches):
+        for patch in patches:
+            gorilla.revert(patch)
+
+    return (setup, run)
+
+
+def _bench_revert_id(args):
+    source = _make_module('source', args.functions)
+
+    def setup():
+        destination = types.ModuleType(str('destination'))
+        for patch in _get_module_patches(destination, source):
+            gorilla.apply(patch, id='benchmark')
+
+        return destination
+
+    def run(destination):
+        gorilla.revert_id('benchmark')
+
+    return (setup, run)
+
+
+def _bench_restore(args):
+    source = _make_module('source', args.functions)
+
+    def setup():
+        destination = types.ModuleType(str('destination'))
+        snapshot = gorilla.snapshot([destination])
+        for patch in _get_module_patches(destination, source):
+            gorilla.apply(patch)
+
+        return snapshot
+
+    def run(snapshot):
+        gorilla.restore(snapshot)
+
+    return (setup, run)
+
+
+def _make_stack(count):
+    destination = type(str('Destination'), (object,), {'method': None})
+    settings = gorilla.Settings(allow_hit=True)
+    patches = [gorilla.Patch(destination, 'method', i, settings=settings)
+               for i in range(count)]
+    return (destination, patches)
+
+
+def _bench_apply_stack(args):
+    def setup():
+        return _make_stack(args.stack)[1]
+
+    def run(patches):
+        for i, patch in enumerate(patches):
+            gorilla.apply(patch, id=str(i))
+
+    return (setup, run)
+
+
+def _bench_revert_stack(args):
+    def setup():
+        _, patches = _make_stack(args.stack)
+        for i, patch in enumerate(patches):
+            gorilla.apply(patch, id=str(i))
+
+        return patches
+
+    def run(patches):
+        for patch in reversed(patches):
+            gorilla.revert(patch)
+
+    return (setup, run)
+
+
+def _bench_revert_all_stack(args):
+    def setup():
+        _, patches = _make_stack(args.stack)
+        for i, patch in enumerate(patches):
+            gorilla.apply(patch, id=str(i))
+
+        return patches
+
+    def run(patches):
+        gorilla.revert_all(patches)
+
+    return (setup, run)
+
+
+def _bench_get_original_attribute_stack(args):
+    def setup():
+        destination, patches = _make_stack(args.stack)
+        for i, patch in enumerate(patches):
+            gorilla.apply(patch, id=str(i))
+
+        return (destination, [str(i) for i in range(args.stack)])
+
+    def run(data):
+        destination, ids = data
+        for id in ids:
+            gorilla.get_original_attribute(destination, 'method', id=id)
+
+    return (setup, run)
+
+
+def _bench_get_original_attribute_hierarchy(args):
+    def setup():
+        classes = _make_hierarchy(args.depth, 1)
+        settings = gorilla.Settings(allow_hit=True)
+        gorilla.apply(gorilla.Patch(classes[0], 'method_0_0', None,
+                                    settings=settings))
+        return classes
+
+    def run(classes):
+        for cls in classes:
+            gorilla.get_original_attribute(cls, 'method_0_0')
+
+    return (setup, run)
+
+
+def _bench_create_patches_module(args):
+    source = _make_module('source', args.functions)
+
+    def setup():
+        return types.ModuleType(str('destination'))
+
+    def run(destination):
+        gorilla.create_patches(destination, source, use_decorators=False)
+
+    return (setup, run)
+
+
+def _bench_create_patches_hierarchy(args):
+    def setup():
+        destination = type(str('Destination'), (object,), {})
+        return (destination, _make_hierarchy(args.depth, args.members))
+
+    def run(data):
+        destination, classes = data
+        gorilla.create_patches(destination, classes[-1], use_decorators=False)
+
+    return (setup, run)
+
+
+def _bench_find_patches(args):
+    def setup():
+        for name in list(sys.modules):
+            if name == _PACKAGE or name.startswith(_PACKAGE + '.'):
+                del sys.modules[name]
+
+        return importlib.import_module(_PACKAGE)
+
+    def run(package):
+        gorilla.find_patches([package])
+
+    return (setup, run)
+
+
+def _bench_load_plan(args):
+    def setup():
+        for name in list(sys.modules):
+            if name == _PACKAGE or name.startswith(_PACKAGE + '.'):
+                del sys.modules[name]
+
+        package = importlib.import_module(_PACKAGE)
+
+        # The plan is written next to the package to be removed along with it.
+        path = os.path.join(os.path.dirname(package.__path__[0]), 'plan.json')
+        patch_set = gorilla.PatchSet(gorilla.find_patches([package]))
+        gorilla.compile_plan([patch_set], path)
+        return path
+
+    def run(path):
+        gorilla.load_plan(path)
+
+    return (setup, run)
+
+
+_CASES = [
+    ('apply', _bench_apply),
+    ('check', _bench_check),
+    ('revert', _bench_revert),
+    ('revert_id', _bench_revert_id),
+    ('restore', _bench_restore),
+    ('apply_stack', _bench_apply_stack),
+    ('revert_stack', _bench_revert_stack),
+    ('revert_all_stack', _bench_revert_all_stack),
+    ('get_original_attribute_stack', _bench_get_original_attribute_stack),
+    ('get_original_attribute_hierarchy',
+     _bench_get_original_attribute_hierarchy),
+    ('create_patches_module', _bench_create_patches_module),
+    ('create_patches_hierarchy', _bench_create_patches_hierarchy),
+    ('find_patches', _bench_find_patches),
+    ('load_plan', _bench_load_plan),
+]
+
+
+def _measure(setup, run, repeat):
+    timings = []
+    for _ in range(repeat):
+        data = setup()
+        gc.disable()
+        try:
+            start = timeit.default_timer()
+            run(data)
+            timings.append(timeit.default_timer() - start)
+        finally:
+            gc.enable()
+
+    peak = None
+    if tracemalloc is not None:
+        data = setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run(data)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {'time': min(timings), 'peak': peak}
+
+
+def _compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+
+        for key in ('time', 'peak'):
+            if not result[key] or not reference[key]:
+                continue
+
+            ratio = result[key] / reference[key]
+            status = ''
+            if ratio > 1.0 + tolerance:
+                status = 'REGRESSION'
+                regressions.append((name, key))
+
+            print("{:<34} {:<4} {:6.2f}x {}".format(name, key, ratio, status))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--functions', type=int, default=10000,
+                        help='number of functions in the source module')
+    parser.add_argument('--depth', type=int, default=20,
+                        help='depth of the class hierarchy')
+    parser.add_argument('--members', type=int, default=50,
+                        help='number of members per class of the hierarchy')
+    parser.add_argument('--stack', type=int, default=100,
+                        help='depth of the stack of patches')
+    parser.add_argument('--modules', type=int, default=100,
+                        help='number of modules in the generated package')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of measurements to take the best of')
+    parser.add_argument('--case', action='append', choices=dict(_CASES),
+                        help='case to run, all of them by default')
+    parser.add_argument('--save', metavar='PATH',
+                        help='file to save the results to as a baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='baseline file to compare the results against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='slowdown ratio tolerated when comparing')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    sys.path.insert(0, root)
+    try:
+        _make_package(root, args.modules, 10)
+        results = {}
+        for name, factory in _CASES:
+            if args.case and name not in args.case:
+                continue
+
+            setup, run = factory(args)
+            results[name] = result = _measure(setup, run, args.repeat)
+            peak = ('{:10.1f} KiB'.format(result['peak'] / 1024)
+                    if result['peak'] is not None else '')
+            print("{:<34} {:10.3f} ms {}".format(
+                name, result['time'] * 1e3, peak))
+    finally:
+        sys.path.remove(root)
+        shutil.rmtree(root)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'version': _BASELINE_VERSION, 'results': results}, f,
+                      indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+
+        if baseline.get('version') != _BASELINE_VERSION:
+            sys.exit("The baseline file '{}' has an unsupported format."
+                     .format(args.compare))
+
+        print()
+        if _compare(results, baseline['results'], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
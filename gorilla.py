@@ -16,10 +16,14 @@ from __future__ import (
     unicode_literals,
 )
 
-__all__ = ['default_filter', 'DecoratorData', 'Settings', 'Patch', 'apply',
-           'patch', 'patches', 'destination', 'name', 'settings', 'filter',
-           'create_patches', 'find_patches', 'get_attribute',
-           'get_original_attribute', 'get_decorator_data']
+__all__ = ['default_filter', 'DecoratorData', 'Settings', 'Patch', 'PatchSet',
+           'Conflict', 'apply', 'apply_all', 'check', 'revert_all',
+           'revert_id', 'snapshot', 'restore', 'patch', 'patches',
+           'destination', 'name', 'settings', 'filter', 'create_patches',
+           'iter_create_patches', 'find_patches', 'iter_patches',
+           'find_entry_point_patches', 'compile_plan', 'load_plan',
+           'load_manifest', 'get_attribute', 'get_original_attribute',
+           'get_decorator_data']
 
 __title__ = 'gorilla'
 __version__ = '0.4.0'
@@ -29,16 +33,24 @@ __author__ = "Christopher Crouzet"
 __contact__ = 'christopher@crouzet.pm'
 __license__ = "MIT"
 
+import ast
 import collections
 import copy
+import importlib
 import inspect
+import json
+import multiprocessing.pool
+import os
 import pkgutil
 import sys
 import types
+import warnings
+import weakref
 
 
 if sys.version_info[0] == 2:
     _CLASS_TYPES = (type, types.ClassType)
+    _STRING_TYPES = (basestring,)  # noqa: F821
 
     def _iteritems(d, **kwargs):
         return d.iteritems(**kwargs)
@@ -46,32 +58,165 @@ if sys.version_info[0] == 2:
     def _load_module(finder, name):
         loader = finder.find_module(name)
         return loader.load_module(name)
+
+    def _find_module_location(finder, name):
+        loader = finder.find_module(name)
+        path = loader.get_filename(name)
+        if loader.is_package(name):
+            return (path, [os.path.dirname(path)])
+
+        return (path, None)
+
+    def _find_module_file(name):
+        loader = pkgutil.find_loader(name)
+        if loader is None:
+            raise ImportError("No module named {}".format(name))
+
+        get_filename = getattr(loader, 'get_filename', None)
+        return None if get_filename is None else get_filename(name)
+
+    def _replace_file(src, dst):
+        if os.path.exists(dst):
+            os.remove(dst)
+
+        os.rename(src, dst)
+
+    def _get_bytecode_path(path):
+        return path + 'c'
 else:
+    import importlib.util
+
     _CLASS_TYPES = (type,)
+    _STRING_TYPES = (str,)
 
     def _iteritems(d, **kwargs):
         return iter(d.items(**kwargs))
 
-    def _load_module(finder, name):
-        loader, _ = finder.find_loader(name)
-        return loader.load_module()
+    if hasattr(importlib.util, 'module_from_spec'):
+        def _load_module(finder, name):
+            spec = finder.find_spec(name)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[name] = module
+            try:
+                spec.loader.exec_module(module)
+            except BaseException:
+                sys.modules.pop(name, None)
+                raise
+
+            return sys.modules[name]
+    else:
+        # Modules can only be created from their specs from Python 3.5
+        # onwards.
+        def _load_module(finder, name):
+            loader = finder.find_module(name)
+            return loader.load_module(name)
 
+    def _find_module_location(finder, name):
+        spec = finder.find_spec(name)
+        return (spec.origin, spec.submodule_search_locations)
 
-# Pattern for each internal attribute name.
-_PATTERN = '_gorilla_{}'
+    def _find_module_file(name):
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ImportError("No module named '{}'".format(name))
+
+        return spec.origin if spec.has_location else None
+
+    def _replace_file(src, dst):
+        os.replace(src, dst)
+
+    def _get_bytecode_path(path):
+        try:
+            return importlib.util.cache_from_source(path)
+        except NotImplementedError:
+            return None
+
+try:
+    import importlib.metadata as _metadata
+except ImportError:
+    try:
+        import importlib_metadata as _metadata
+    except ImportError:
+        _metadata = None
 
-# Pattern for the flag expressing whether an attribute was created.
-_CREATED = _PATTERN.format('created_{}')
+try:
+    import tomllib as _toml
+except ImportError:
+    try:
+        import tomli as _toml
+    except ImportError:
+        _toml = None
 
-# Pattern for the ids of the original attributes stored.
-_ORIGINAL_IDS = _PATTERN.format('ids_{}')
 
-# Pattern for each original attribute stored.
-_ORIGINAL_ITEM = _PATTERN.format('item_{}_{}')
+# Pattern for each internal attribute name.
+_PATTERN = '_gorilla_{}'
 
 # Attribute for the decorator data.
 _DECORATOR_DATA = _PATTERN.format('decorator_data')
 
+# Attribute for the ledger record of a destination.
+_LEDGER_RECORD = _PATTERN.format('ledger_record')
+
+# Name of the parameter through which a patch receives the original attribute.
+_ORIGINAL_PARAMETER = '__original__'
+
+# Names of the decorators creating patches, as searched by the static analysis
+# of `find_patches()`.
+_PATCH_DECORATORS = ('patch', 'patches')
+
+# Version of the format used by the cache of `find_patches()`.
+_CACHE_VERSION = 1
+
+# Group of the entry points searched by `find_entry_point_patches()`.
+_ENTRY_POINT_GROUP = 'gorilla.patches'
+
+# Version of the format used by the plans of `compile_plan()`.
+_PLAN_VERSION = 1
+
+# Keys of the entries of the manifests read by `load_manifest()`.
+_MANIFEST_KEYS = ('destination', 'name', 'object', 'settings')
+
+# Types of the objects stored by value in the plans.
+_LITERAL_TYPES = _STRING_TYPES + (bool, int, float, type(None))
+
+# Sentinel for missing values.
+_MISSING = object()
+
+# Sentinel for values left unchanged.
+_UNCHANGED = object()
+
+# Patches waiting for their destination module to be imported, as a list of
+# tuples made of the patch and of the patch id, keyed by the module name.
+_DEFERRED = {}
+
+# Locations of the ledger entries of each patch id, as tuples made of the
+# identity of the destination and of the attribute name.
+_LEDGER_IDS = {}
+
+# Read-only settings shared across patches, keyed by their content.
+_SHARED_SETTINGS = {}
+
+# Names of the members of the classes, sorted, along with the position of the
+# class defining each member within the method resolution order, keyed by the
+# identity of the classes and by whether their bases were traversed. It is
+# cleared whenever a class is patched.
+_MEMBER_CACHE = {}
+
+# Destinations holding a record of the original attributes stored when
+# applying patches, referenced weakly whenever possible and keyed by their
+# identity. The records themselves are stored on the destinations so that a
+# destination referenced by its original attributes, such as through a method
+# calling `super()`, can still be garbage collected.
+_LEDGER = {}
+
+# Destinations owning the original attributes resolved by
+# `get_original_attribute()`, keyed by the identity of the object searched, the
+# attribute name, and the patch id. Both the object searched and the owner are
+# referenced weakly, and the original attributes are read back from the ledger
+# record of the owner, so that no object is kept alive. It is cleared whenever
+# the ledger changes.
+_ORIGINAL_CACHE = {}
+
 
 def default_filter(name, obj):
     """Attribute filter.
@@ -112,6 +257,8 @@ class DecoratorData(object):
         otherwise.
     """
 
+    __slots__ = ('patches', 'override', 'filter')
+
     def __init__(self):
         """Constructor."""
         self.patches = []
@@ -131,10 +278,21 @@ class Settings(object):
         Defaults to ``False``.
     store_hit : bool
         If ``True`` and :attr:`allow_hit` is also set to ``True``, then any
-        attribute at the destination that is hit is stored under a different
-        name before being overwritten by the patch. Defaults to ``True``.
+        attribute at the destination that is hit is stored aside before being
+        overwritten by the patch. Defaults to ``True``.
+
+    Note
+    ----
+    The settings of the patches created by the decorators and by
+    :func:`create_patches` are read-only copies shared across the patches
+    having equal settings. Modifying them raises an :class:`AttributeError`,
+    a copy obtained through ``copy.copy()`` needs to be modified instead.
     """
 
+    # The instance dictionary only holds extra settings, if any. The hash is
+    # only cached for shared settings since they are read-only.
+    __slots__ = ('allow_hit', 'store_hit', '_shared', '_hash', '__dict__')
+
     def __init__(self, **kwargs):
         """Constructor.
 
@@ -143,6 +301,8 @@ class Settings(object):
         kwargs
             Keyword arguments, see the attributes.
         """
+        object.__setattr__(self, '_shared', False)
+        object.__setattr__(self, '_hash', None)
         self.allow_hit = False
         self.store_hit = True
         self._update(**kwargs)
@@ -150,15 +310,21 @@ class Settings(object):
     def __repr__(self):
         values = ', '.join([
             '{}={!r}'.format(key, value)
-            for key, value in sorted(_iteritems(self.__dict__))])
+            for key, value in sorted(_iteritems(_get_state(self)))])
         return '{}({})'.format(type(self).__name__, values)
 
     def __hash__(self):
-        return hash(sorted(_iteritems(self.__dict__)))
+        out = self._hash
+        if out is None:
+            out = hash(tuple(sorted(_iteritems(_get_state(self)))))
+            if self._shared:
+                object.__setattr__(self, '_hash', out)
+
+        return out
 
     def __eq__(self, other):
         if isinstance(other, type(self)):
-            return self.__dict__ == other.__dict__
+            return _get_state(self) == _get_state(other)
 
         return NotImplemented
 
@@ -166,9 +332,31 @@ class Settings(object):
         is_equal = self.__eq__(other)
         return is_equal if is_equal is NotImplemented else not is_equal
 
+    def __setattr__(self, name, value):
+        if self._shared:
+            raise AttributeError(
+                "Shared settings are read-only, modify a copy instead.")
+
+        object.__setattr__(self, name, value)
+
+    def __copy__(self):
+        return type(self)(**_get_state(self))
+
+    def __deepcopy__(self, memo):
+        return type(self)(**copy.deepcopy(_get_state(self), memo))
+
+    def __reduce__(self):
+        # Unpickled settings are never shared, the state is restored through
+        # the regular attribute assignments.
+        return (type(self), (), _get_state(self))
+
+    def __setstate__(self, state):
+        self._update(**state)
+
     def _update(self, **kwargs):
         """Update some settings."""
-        self.__dict__.update(**kwargs)
+        for key, value in _iteritems(kwargs):
+            setattr(self, key, value)
 
 
 class Patch(object):
@@ -176,8 +364,9 @@ class Patch(object):
 
     Attributes
     ----------
-    destination : obj
-        Patch destination.
+    destination : obj or str
+        Patch destination, or its path in the form ``'module:qualname'``. The
+        qualified name is optional when the destination is the module itself.
     name : str
         Name of the attribute at the destination.
     obj : obj
@@ -193,6 +382,9 @@ class Patch(object):
     retrieving attributes invalid for patching, such as bound methods.
     """
 
+    # The instance dictionary only holds extra attributes, if any.
+    __slots__ = ('destination', 'name', 'obj', 'settings', '__dict__')
+
     def __init__(self, destination, name, obj, settings=None):
         """Constructor.
 
@@ -220,11 +412,13 @@ class Patch(object):
                 self.settings))
 
     def __hash__(self):
-        return hash(sorted(_iteritems(self.__dict__)))
+        # Only the destination and the name are hashed since the value of
+        # the attribute and the extra attributes might not be hashable.
+        return hash((self.destination, self.name))
 
     def __eq__(self, other):
         if isinstance(other, type(self)):
-            return self.__dict__ == other.__dict__
+            return _get_state(self) == _get_state(other)
 
         return NotImplemented
 
@@ -232,25 +426,205 @@ class Patch(object):
         is_equal = self.__eq__(other)
         return is_equal if is_equal is NotImplemented else not is_equal
 
+    def __reduce__(self):
+        return (
+            type(self), (self.destination, self.name, self.obj),
+            _get_state(self))
+
+    def __setstate__(self, state):
+        for key, value in _iteritems(state):
+            setattr(self, key, value)
+
     def _update(self, **kwargs):
         """Update some attributes.
 
         If a 'settings' attribute is passed as a dict, then it updates the
         content of the settings, if any, instead of completely overwriting it.
+        The settings are shared, and only copied if their content changes.
         """
         for key, value in _iteritems(kwargs):
             if key == 'settings':
                 if isinstance(value, dict):
                     if self.settings is None:
-                        self.settings = Settings(**value)
+                        settings = Settings(**value)
+                    elif all(getattr(self.settings, key_, _MISSING) == value_
+                             for key_, value_ in _iteritems(value)):
+                        settings = self.settings
                     else:
-                        self.settings._update(**value)
+                        settings = copy.copy(self.settings)
+                        settings._update(**value)
                 else:
-                    self.settings = copy.deepcopy(value)
+                    settings = value
+
+                self.settings = _share_settings(settings)
             else:
                 setattr(self, key, value)
 
 
+class PatchSet(object):
+    """Group of patches applied and reverted as a whole.
+
+    The conflicts are checked across the whole set before any attribute is
+    modified, and reverting the set restores all the attributes in one
+    operation, along with the original attributes stored.
+
+    A patch set can also be used as a context manager, in which case it is
+    applied when entering the context and reverted when exiting it.
+
+    Attributes
+    ----------
+    patches : list of gorilla.Patch
+        Patches, in the order in which they need to be applied.
+    id : str
+        Identifier of the original attributes stored when applying the set.
+
+    Warning
+    -------
+    Reverting the set restores the state of the attributes as it was before
+    the set was applied, thus undoing any change made to these same attributes
+    in the meantime.
+
+    Note
+    ----
+    Patches describing their destination with a path are never deferred when
+    part of a set. Instead, their destination module is imported when
+    applying the set.
+    """
+
+    def __init__(self, patches=None, id='default'):
+        """Constructor.
+
+        Parameters
+        ----------
+        patches : list of gorilla.Patch
+            See the :attr:`~PatchSet.patches` attribute.
+        id : str
+            See the :attr:`~PatchSet.id` attribute.
+        """
+        self.patches = [] if patches is None else list(patches)
+        self.id = id
+        self._undo = None
+
+    def __repr__(self):
+        return '{}(patches={!r}, id={!r})'.format(
+            type(self).__name__, self.patches, self.id)
+
+    def __enter__(self):
+        self.apply()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.revert()
+
+    @property
+    def applied(self):
+        """Whether the set is currently applied."""
+        return self._undo is not None
+
+    def apply(self):
+        """Apply all the patches of the set, or none at all.
+
+        Raises
+        ------
+        RuntimeError
+            The set is already applied, or one of its patches is hitting an
+            existing attribute while the setting :attr:`Settings.allow_hit` is
+            set to ``False``. No attribute is modified in this case.
+        """
+        if self.applied:
+            raise RuntimeError("The patch set is already applied.")
+
+        patches = [_resolve_patch(patch) for patch in self.patches]
+        self._undo = _commit(*_prepare(patches, self.id))
+
+    def check(self):
+        """Find the conflicts within the set without applying it.
+
+        Returns
+        -------
+        list of gorilla.Conflict
+            The conflicts found, in the order of the patches.
+
+        See Also
+        --------
+        :func:`check`.
+        """
+        return check(self.patches)
+
+    def revert(self):
+        """Revert all the patches of the set.
+
+        Raises
+        ------
+        RuntimeError
+            The set is not applied.
+        """
+        if not self.applied:
+            raise RuntimeError("The patch set is not applied.")
+
+        error = _rollback(self._undo)
+        self._undo = None
+        if error is not None:
+            raise error
+
+
+class Conflict(object):
+    """Conflict found by :func:`check`.
+
+    Attributes
+    ----------
+    kind : str
+        Kind of conflict, either:
+
+        - ``'hit'``: the patch hits an existing attribute while the setting
+          :attr:`Settings.allow_hit` is set to ``False``;
+        - ``'duplicate'``: the object of the patch is already patched earlier
+          in the batch with the same destination and name;
+        - ``'order'``: the patch hits an attribute set earlier in the batch
+          while the setting :attr:`Settings.allow_hit` is set to ``False``,
+          thus it would need to be applied first.
+    patch : gorilla.Patch
+        Patch in conflict.
+    other : gorilla.Patch or None
+        Patch earlier in the batch that the patch conflicts with, if any.
+    """
+
+    __slots__ = ('kind', 'patch', 'other')
+
+    def __init__(self, kind, patch, other=None):
+        """Constructor.
+
+        Parameters
+        ----------
+        kind : str
+            See the :attr:`~Conflict.kind` attribute.
+        patch : gorilla.Patch
+            See the :attr:`~Conflict.patch` attribute.
+        other : gorilla.Patch
+            See the :attr:`~Conflict.other` attribute.
+        """
+        self.kind = kind
+        self.patch = patch
+        self.other = other
+
+    def __repr__(self):
+        return '{}(kind={!r}, patch={!r}, other={!r})'.format(
+            type(self).__name__, self.kind, self.patch, self.other)
+
+    def __str__(self):
+        destination = self.patch.destination
+        if not isinstance(destination, _STRING_TYPES):
+            destination = destination.__name__
+
+        reason = {
+            'hit': "hits an existing attribute",
+            'duplicate': "duplicates an earlier patch",
+            'order': "hits an attribute set by an earlier patch",
+        }[self.kind]
+        return ("The patch of the attribute named '{}' at the destination "
+                "'{}' {}.".format(self.patch.name, destination, reason))
+
+
 def apply(patch, id='default'):
     """Apply a patch.
 
@@ -280,39 +654,177 @@ def apply(patch, id='default'):
     :attr:`Settings.store_hit` are ``True`` but that the target attribute seems
     to have already been stored, then it won't be stored again to avoid losing
     the original attribute that was stored the first time around.
+
+    Note
+    ----
+    If the patch's object is a function, or a static or class method, defining
+    a parameter named ``__original__`` with a default value, then a copy of
+    the function is injected instead, with that default value set to the
+    attribute being overwritten. This allows calling the original attribute
+    at the cost of a plain function call rather than going through
+    :func:`get_original_attribute`:
+
+    .. code-block:: python
+
+       def method(self, __original__=None):
+           return __original__(self) + 1
+
+    Any static method, class method, or property wrapping the original
+    attribute is removed beforehand, meaning that the original attribute of a
+    method or of a class method needs to be passed ``self`` or ``cls``
+    explicitly.
+
+    Note
+    ----
+    If the patch's destination is a path and that its module is not imported
+    yet, then the patch is deferred until that module gets imported for the
+    first time, without importing it. This is done through a finder inserted
+    into ``sys.meta_path`` for as long as some patches are deferred. A
+    deferred patch that fails to apply once its module is imported issues a
+    :class:`RuntimeWarning` instead of raising an exception.
     """
+    if isinstance(patch.destination, _STRING_TYPES):
+        if _defer(patch, id):
+            return
+
+        patch = _resolve_patch(patch)
+
     settings = Settings() if patch.settings is None else patch.settings
 
     # When a hit occurs due to an attribute at the destination already existing
     # with the patch's name, the existing attribute is referred to as 'target'.
+    obj = patch.obj
     try:
         target = get_attribute(patch.destination, patch.name)
     except AttributeError:
-        created = _CREATED.format(patch.name)
-        setattr(patch.destination, created, True)
+        entry = (id, _MISSING, patch.obj)
     else:
         if not settings.allow_hit:
-            raise RuntimeError(
-                "An attribute named '{}' already exists at the destination "
-                "'{}'. Set a different name through the patch object to avoid "
-                "a name clash or set the setting 'allow_hit' to True to "
-                "overwrite the attribute. In the latter case, it is "
-                "recommended to also set the 'store_hit' setting to True in "
-                "order to store the original attribute under a different "
-                "name so it can still be accessed."
-                .format(patch.name, patch.destination.__name__))
+            raise _get_hit_error(patch)
+
+        entry = (id, target, patch.obj) if settings.store_hit else None
+        obj = _bind_original_attribute(patch.obj, target)
+
+    setattr(patch.destination, patch.name, obj)
+    _clear_member_cache(patch.destination)
+    if entry is not None:
+        entries = _get_ledger_entries(patch.destination, patch.name)
+        _set_ledger_entries(patch.destination, patch.name, entries + (entry,))
+
+
+def apply_all(patches, id='default'):
+    """Apply a batch of patches in a single pass.
+
+    This is equivalent to calling :func:`apply` on each patch in order but the
+    targets of the whole batch are resolved before any attribute is modified,
+    and the work is then committed one destination at a time. Each attribute
+    and its bookkeeping data are only written once, whatever the number of
+    patches stacked on top of it within the batch.
+
+    Parameters
+    ----------
+    patches : list of gorilla.Patch
+        Patches, in the order in which they need to be applied.
+    id : str
+        When applying a stack of patches on top of a same attribute, this
+        identifier allows to pinpoint a specific original attribute if needed.
+
+    Raises
+    ------
+    RuntimeError
+        Overwriting an existing attribute is not allowed when the setting
+        :attr:`Settings.allow_hit` is set to ``False``. Since the targets are
+        resolved beforehand, no attribute is modified when this occurs.
+
+    Note
+    ----
+    If setting an attribute fails while committing the batch, the
+    attributes already set are restored before the error is propagated.
+
+    No speedup over calling :func:`apply` in a loop is guaranteed since it
+    depends on the patches and on the interpreter. The script
+    ``benchmarks/apply_all.py`` measures it.
+
+    Patches describing their destination with a path are deferred in the
+    same way as with :func:`apply` if their module is not imported yet.
+
+    See Also
+    --------
+    :func:`apply`, :class:`PatchSet`.
+    """
+    resolved = []
+    for patch in patches:
+        if isinstance(patch.destination, _STRING_TYPES):
+            if _defer(patch, id):
+                continue
+
+            patch = _resolve_patch(patch)
+
+        resolved.append(patch)
+
+    _commit(*_prepare(resolved, id))
+
+
+def check(patches):
+    """Find the conflicts within a batch of patches without applying them.
+
+    The patches are checked in a single pass, in the order in which they would
+    be applied, and all the conflicts are reported instead of only the first
+    one.
+
+    Parameters
+    ----------
+    patches : list of gorilla.Patch
+        Patches, in the order in which they need to be applied.
+
+    Returns
+    -------
+    list of gorilla.Conflict
+        The conflicts found, in the order of the patches.
 
-        if settings.store_hit:
-            original_ids = _ORIGINAL_IDS.format(patch.name)
-            ids = getattr(patch.destination, original_ids, ())
+    Note
+    ----
+    The destination modules of the patches describing their destination with
+    a path are imported.
 
-            original_item = _ORIGINAL_ITEM.format(patch.name, len(ids))
-            setattr(patch.destination, original_item, target)
+    See Also
+    --------
+    :func:`apply_all`, :meth:`PatchSet.check`.
+    """
+    settings = Settings()
+    out = []
 
-            ids += (id,)
-            setattr(patch.destination, original_ids, ids)
+    # The patches of the batch are indexed by the identity of their
+    # destination and by their name. The topmost ones are also used as an
+    # overlay to resolve the targets of the patches following them.
+    index = {}
+    overlay = {}
+    cache = {}
+    for patch in patches:
+        resolved = _resolve_patch(patch)
+        destination = resolved.destination
+        name = resolved.name
+        key = (id(destination), name)
+        others = index.get(key)
+        if others is None:
+            others = index[key] = {}
+        elif id(patch.obj) in others:
+            out.append(Conflict('duplicate', patch, others[id(patch.obj)]))
+            continue
+
+        settings_ = settings if patch.settings is None else patch.settings
+        if not settings_.allow_hit:
+            target = _resolve_attribute(destination, name, overlay, cache)
+            existing = _resolve_attribute(destination, name, {}, cache)
+            if existing is not _MISSING:
+                out.append(Conflict('hit', patch))
+            elif target is not _MISSING:
+                out.append(Conflict('order', patch, target))
+
+        others[id(patch.obj)] = patch
+        overlay.setdefault(id(destination), {})[name] = patch
 
-    setattr(patch.destination, patch.name, patch.obj)
+    return out
 
 
 def revert(patch):
@@ -327,28 +839,199 @@ def revert(patch):
     ----
     This is only possible if the attribute :attr:`Settings.store_hit` was set
     to ``True`` when applying the patch and overriding an existing attribute.
+
+    Note
+    ----
+    A patch that is still deferred is discarded instead.
     """
-    created = _CREATED.format(patch.name)
-    if getattr(patch.destination, created, False):
-        delattr(patch.destination, patch.name)
-        return
+    if isinstance(patch.destination, _STRING_TYPES):
+        if _discard_deferred(patch):
+            return
 
-    original_ids = _ORIGINAL_IDS.format(patch.name)
-    try:
-        ids = getattr(patch.destination, original_ids)
-        if not ids:
-            raise AttributeError
-    except AttributeError:
+        patch = _resolve_patch(patch)
+
+    entries = _get_ledger_entries(patch.destination, patch.name)
+    if not entries:
         raise RuntimeError(
             "Cannot revert the attribute named '{}' since the setting "
             "'store_hit' was not set to True when applying the patch."
             .format(patch.destination.__name__))
 
-    original_item = _ORIGINAL_ITEM.format(patch.name, len(ids) - 1)
-    attr = getattr(patch.destination, original_item)
-    setattr(patch.destination, patch.name, attr)
-    delattr(patch.destination, original_item)
-    setattr(patch.destination, original_ids, ids[:-1])
+    _, original, _ = entries[-1]
+    if original is _MISSING:
+        delattr(patch.destination, patch.name)
+    else:
+        setattr(patch.destination, patch.name, original)
+
+    _clear_member_cache(patch.destination)
+
+    _set_ledger_entries(patch.destination, patch.name, entries[:-1])
+
+
+def revert_all(patches):
+    """Revert a batch of patches.
+
+    Each patch is matched with the topmost entry of the attribute's stack that
+    was created by applying it, and the patches can be reverted in any order,
+    including from the middle of a stack. The patches remaining on top of the
+    ones reverted are set again over their new original attribute.
+
+    Parameters
+    ----------
+    patches : list of gorilla.Patch
+        Patches to revert.
+
+    Raises
+    ------
+    RuntimeError
+        A patch was not applied, or the setting :attr:`Settings.store_hit` was
+        ``False`` when applying it over an existing attribute. No attribute is
+        reverted in this case.
+
+    Note
+    ----
+    The patches that are still deferred are discarded instead.
+
+    See Also
+    --------
+    :func:`revert`, :func:`revert_id`.
+    """
+    # The deferred patches are only discarded once the whole batch is known
+    # to be revertable.
+    deferred = []
+    removals = collections.OrderedDict()
+    for patch in patches:
+        if isinstance(patch.destination, _STRING_TYPES):
+            if _is_deferred(patch):
+                deferred.append(patch)
+                continue
+
+            patch = _resolve_patch(patch)
+
+        key = (id(patch.destination), patch.name)
+        removal = removals.get(key)
+        if removal is None:
+            # Map the identity of each patch object found in the stack to its
+            # indices, from the bottom to the top.
+            positions = {}
+            entries = _get_ledger_entries(patch.destination, patch.name)
+            for i, entry in enumerate(entries):
+                positions.setdefault(id(entry[2]), []).append(i)
+
+            removal = removals[key] = (patch.destination, positions, set())
+
+        indices = removal[1].get(id(patch.obj))
+        if not indices:
+            raise RuntimeError(
+                "Cannot revert the patch {!r} since it was either not applied "
+                "or the setting 'store_hit' was not set to True when applying "
+                "it.".format(patch))
+
+        removal[2].add(indices.pop())
+
+    for patch in deferred:
+        _discard_deferred(patch)
+
+    for (_, name), (destination, _, indices) in _iteritems(removals):
+        _remove_ledger_entries(destination, name, indices)
+
+
+def revert_id(id):
+    """Revert all the patches applied under a given identifier.
+
+    The patches can be found anywhere in the stacks of the attributes. The
+    patches remaining on top of the ones reverted are set again over their new
+    original attribute.
+
+    Parameters
+    ----------
+    id : str
+        Identifier passed when applying the patches.
+
+    Note
+    ----
+    The patches that were applied over an existing attribute while the
+    setting :attr:`Settings.store_hit` was ``False`` are not tracked and thus
+    cannot be reverted.
+
+    The patches deferred under the identifier are discarded instead.
+
+    See Also
+    --------
+    :func:`revert`, :func:`revert_all`.
+    """
+    _discard_deferred_id(id)
+    for key, name in list(_LEDGER_IDS.get(id, ())):
+        destination = _LEDGER[key]()
+        entries = _get_record(destination).entries[name]
+        indices = {i for i, entry in enumerate(entries) if entry[0] == id}
+        _remove_ledger_entries(destination, name, indices)
+
+
+def snapshot(destinations):
+    """Capture the state of some destinations.
+
+    The attributes of each destination are captured along with the original
+    attributes stored for them.
+
+    Parameters
+    ----------
+    destinations : list of object
+        Destinations.
+
+    Returns
+    -------
+    object
+        Snapshot to pass to :func:`restore`.
+
+    See Also
+    --------
+    :func:`restore`.
+    """
+    out = []
+    for destination in destinations:
+        record = _get_record(destination)
+        entries = {} if record is None else dict(record.entries)
+        attributes = dict(vars(destination))
+        attributes.pop(_LEDGER_RECORD, None)
+        out.append((destination, attributes, entries))
+
+    return out
+
+
+def restore(snapshot):
+    """Restore the state of some destinations.
+
+    Any attribute added since the snapshot was taken is removed, including the
+    data set by the decorators, and any attribute modified is set back to its
+    previous value. This is done in a single pass over the attributes of each
+    destination, whatever the number of patches applied in the meantime.
+
+    Parameters
+    ----------
+    snapshot : object
+        Snapshot returned by :func:`snapshot`.
+
+    Note
+    ----
+    Only the attributes defined directly on the destinations are restored.
+
+    See Also
+    --------
+    :func:`snapshot`.
+    """
+    for destination, attributes, entries in snapshot:
+        current = vars(destination)
+        values = {name: _MISSING for name in current
+                  if name not in attributes and name != _LEDGER_RECORD}
+        for name, value in _iteritems(attributes):
+            if current.get(name, _MISSING) is not value:
+                values[name] = value
+
+        if values:
+            _set_attributes(destination, values)
+
+        _reset_ledger_record(destination, entries)
 
 
 def patch(destination, name=None, settings=None):
@@ -378,7 +1061,7 @@ def patch(destination, name=None, settings=None):
     def decorator(wrapped):
         base = _get_base(wrapped)
         name_ = base.__name__ if name is None else name
-        settings_ = copy.deepcopy(settings)
+        settings_ = _share_settings(settings)
         patch = Patch(destination, name_, wrapped, settings=settings_)
         data = get_decorator_data(base, set_default=True)
         data.patches.append(patch)
@@ -418,17 +1101,27 @@ def patches(destination, settings=None, traverse_bases=True,
     object
         The decorated object.
 
-    Note
-    ----
+    Raises
+    ------
+    ValueError
+        The destination is described by a path whose module is not imported
+        yet while ``recursive`` is ``True`` and a member is a class, in which
+        case its target can't be resolved.
+
+    Note
+    ----
     A 'target' differs from a 'destination' in that a target represents an
     existing attribute at the destination about to be hit by a patch.
 
+    The patches created for the members of nested classes have their target
+    as destination, even if the destination is described by a path.
+
     See Also
     --------
     :class:`Patch`, :func:`create_patches`.
     """
     def decorator(wrapped):
-        settings_ = copy.deepcopy(settings)
+        settings_ = _share_settings(settings)
         patches = create_patches(
             destination, wrapped, settings=settings_,
             traverse_bases=traverse_bases, filter=filter, recursive=recursive,
@@ -575,20 +1268,98 @@ def create_patches(destination, root, settings=None, traverse_bases=True,
     list of gorilla.Patch
         The patches.
 
+    Raises
+    ------
+    ValueError
+        The destination is described by a path whose module is not imported
+        yet while ``recursive`` is ``True`` and a member is a class, in which
+        case its target can't be resolved.
+
     Note
     ----
     A 'target' differs from a 'destination' in that a target represents an
     existing attribute at the destination about to be hit by a patch.
 
+    The patches created for the members of nested classes have their target
+    as destination, even if the destination is described by a path.
+
+    Warning
+    -------
+    The members of each class are cached until a class is patched through
+    this module, allowing the large hierarchies to be scanned once. A class
+    modified by other means in the meantime might see its members outdated.
+
+    See Also
+    --------
+    :func:`patches`, :func:`iter_create_patches`.
+    """
+    return list(iter_create_patches(
+        destination, root, settings=settings, traverse_bases=traverse_bases,
+        filter=filter, recursive=recursive, use_decorators=use_decorators))
+
+
+def iter_create_patches(destination, root, settings=None,
+                        traverse_bases=True, filter=default_filter,
+                        recursive=True, use_decorators=True):
+    """Iterate over the patches created for the members of a module or a class.
+
+    This is the lazy counterpart of :func:`create_patches`, yielding the
+    patches in the same order as they are created.
+
+    Parameters
+    ----------
+    destination : object
+        Patch destination.
+    root : object
+        Root object, either a module or a class.
+    settings : gorilla.Settings
+        Settings.
+    traverse_bases : bool
+        If the object is a class, the base classes are also traversed.
+    filter : function
+        Attributes for which the function returns ``False`` are skipped. The
+        function needs to define two parameters: ``name``, the attribute name,
+        and ``obj``, the attribute value. If ``None``, no attribute is skipped.
+    recursive : bool
+        If ``True``, and a hit occurs due to an attribute at the destination
+        already existing with the given name, and both the member and the
+        target attributes are classes, then instead of creating a patch
+        directly with the member attribute value as is, a patch for each of its
+        own members is created with the target as new destination.
+    use_decorators : bool
+        ``True`` to take any modifier decorator into consideration to allow for
+        more granular customizations.
+
+    Yields
+    ------
+    gorilla.Patch
+        The patches.
+
+    Raises
+    ------
+    ValueError
+        The destination is described by a path whose module is not imported
+        yet while ``recursive`` is ``True`` and a member is a class, in which
+        case its target can't be resolved.
+
+    Note
+    ----
+    The targets are resolved as the patches are yielded. Applying the patches
+    while iterating might thus change the destination of the patches created
+    for the members of nested classes when ``recursive`` is ``True``.
+
+    The patches created for the members of nested classes have their target
+    as destination, even if the destination is described by a path.
+
     See Also
     --------
-    :func:`patches`.
+    :func:`create_patches`.
     """
     if filter is None:
         filter = _true
 
-    out = []
-    root_patch = Patch(destination, '', root, settings=settings)
+    root_patch = Patch(destination, '', root,
+                       settings=_share_settings(settings))
     stack = collections.deque((root_patch,))
     while stack:
         parent_patch = stack.popleft()
@@ -596,7 +1367,7 @@ def create_patches(destination, root, settings=None, traverse_bases=True,
                                filter=None, recursive=False)
         for name, value in members:
             patch = Patch(parent_patch.destination, name, value,
-                          settings=copy.deepcopy(parent_patch.settings))
+                          settings=parent_patch.settings)
             if use_decorators:
                 base = _get_base(value)
                 decorator_data = get_decorator_data(base)
@@ -613,7 +1384,8 @@ def create_patches(destination, root, settings=None, traverse_bases=True,
 
             if recursive and isinstance(value, _CLASS_TYPES):
                 try:
-                    target = get_attribute(patch.destination, patch.name)
+                    target = get_attribute(
+                        _resolve_imported_destination(patch), patch.name)
                 except AttributeError:
                     pass
                 else:
@@ -622,12 +1394,11 @@ def create_patches(destination, root, settings=None, traverse_bases=True,
                         stack.append(patch)
                         continue
 
-            out.append(patch)
-
-    return out
+            yield patch
 
 
-def find_patches(modules, recursive=True):
+def find_patches(modules, recursive=True, cache=None, static=False,
+                 unique=False, workers=None):
     """Find all the patches created through decorators.
 
     Parameters
@@ -636,6 +1407,25 @@ def find_patches(modules, recursive=True):
         Modules and/or packages to search the patches in.
     recursive : bool
         ``True`` to search recursively in subpackages.
+    cache : str
+        Path to a file caching, for each module, the members defining patches.
+        Only the modules defining patches are then imported, and their members
+        aren't scanned anymore, as long as their source file is left
+        unchanged. The file is created or updated as needed. If ``None``, no
+        cache is used.
+    static : bool
+        ``True`` to parse the source of the modules beforehand and to only
+        import the ones referring to the :func:`patch` or :func:`patches`
+        decorators from this module.
+    unique : bool
+        ``True`` to only return the first occurrence of the patches found more
+        than once, such as when a decorated object is reachable from several
+        modules.
+    workers : int
+        Number of threads reading the files of the modules ahead of importing
+        them, which mostly benefits file systems with a high latency. The
+        modules are still imported one at a time, in the same order. If
+        ``None``, the files are not read ahead.
 
     Returns
     -------
@@ -647,23 +1437,447 @@ def find_patches(modules, recursive=True):
     TypeError
         The input is not a valid package or module.
 
+    Warning
+    -------
+    When using a cache or the static analysis, the modules not defining any
+    patch are skipped. This assumes that importing them has no side effect on
+    the patches defined elsewhere. Also, the static analysis only recognizes
+    the decorators referred to through an ``import gorilla`` or a
+    ``from gorilla import ...`` statement.
+
+    See Also
+    --------
+    :func:`patch`, :func:`patches`, :func:`iter_patches`.
+    """
+    return list(iter_patches(modules, recursive=recursive, cache=cache,
+                             static=static, unique=unique, workers=workers))
+
+
+def iter_patches(modules, recursive=True, cache=None, static=False,
+                 unique=False, release=False, workers=None):
+    """Iterate over the patches created through decorators.
+
+    This is the lazy counterpart of :func:`find_patches`, yielding the
+    patches in the same order as they are found. The modules are only imported
+    as the iteration reaches them.
+
+    Parameters
+    ----------
+    modules : list of module
+        Modules and/or packages to search the patches in.
+    recursive : bool
+        ``True`` to search recursively in subpackages.
+    cache : str
+        Path to a file caching, for each module, the members defining patches.
+        See :func:`find_patches`. The file is only updated once the iteration
+        completes.
+    static : bool
+        ``True`` to parse the source of the modules beforehand and to only
+        import the ones referring to the :func:`patch` or :func:`patches`
+        decorators from this module.
+    unique : bool
+        ``True`` to only yield the first occurrence of the patches found more
+        than once.
+    release : bool
+        ``True`` to remove the decorator data from the decorated objects once
+        their patches are found, so that the patches are only held by the
+        consumer of the iterator.
+    workers : int
+        Number of threads reading the files of the modules ahead of importing
+        them. See :func:`find_patches`.
+
+    Yields
+    ------
+    gorilla.Patch
+        Patches found.
+
+    Raises
+    ------
+    TypeError
+        The input is not a valid package or module.
+
+    Warning
+    -------
+    The patches of an object whose decorator data was released cannot be
+    found anymore, be it by a later search or when the object is reachable
+    from several modules.
+
+    See Also
+    --------
+    :func:`find_patches`.
+    """
+    if cache is not None or static:
+        patches = _iter_patches_selectively(modules, recursive, cache, static,
+                                            release, workers)
+    else:
+        if workers:
+            _prefetch_modules(modules, recursive, workers)
+
+        patches = (patch
+                   for package in modules
+                   for module in _module_iterator(package,
+                                                  recursive=recursive)
+                   for patch in _get_module_patches(module, release)[0])
+
+    if unique:
+        patches = _iter_unique(patches)
+
+    for patch in patches:
+        yield patch
+
+
+def find_entry_point_patches(group=_ENTRY_POINT_GROUP, cache=None):
+    """Find the patches pointed to by the entry points of a group.
+
+    Each entry point refers either to a module, in which case the patches
+    defined by its members are found, or to an object decorated with
+    :func:`patch` or :func:`patches` in the form ``'module:qualname'``. The
+    packages are never walked, thus only the modules referred to are imported.
+
+    Parameters
+    ----------
+    group : str
+        Group of the entry points, as declared by the distributions.
+    cache : str
+        Path to a file caching the entry points of the group, as well as the
+        members defining patches for each module referred to. The entry points
+        are read again whenever a directory of ``sys.path`` is modified, such
+        as when installing a distribution. The file can be shared with
+        :func:`find_patches`. If ``None``, no cache is used.
+
+    Returns
+    -------
+    list of gorilla.Patch
+        Patches found, in the order of the names of the entry points.
+
+    Raises
+    ------
+    RuntimeError
+        Neither the ``importlib.metadata`` module nor the
+        ``importlib_metadata`` distribution is available and the entry points
+        aren't cached.
+
     See Also
     --------
-    :func:`patch`, :func:`patches`.
+    :func:`find_patches`.
     """
+    entries = {} if cache is None else _read_cache(cache)
+    updated = False
+
+    # Entry points are cached under a key that can't be a module name. The
+    # directory of the cache file is left out of the stamp since writing the
+    # file modifies it.
+    key = ':{}'.format(group)
+    directory = (None if cache is None
+                 else os.path.dirname(os.path.abspath(cache)))
+    stamp = [[path, _get_file_stamp(path)] for path in sys.path
+             if os.path.abspath(path) != directory]
+    entry = entries.get(key)
+    if entry is not None and entry.get('stamp') == stamp:
+        values = entry['values']
+    else:
+        values = _get_entry_point_values(group)
+        entries[key] = {'stamp': stamp, 'values': values}
+        updated = True
+
     out = []
-    modules = (module
-               for package in modules
-               for module in _module_iterator(package, recursive=recursive))
-    for module in modules:
-        members = _get_members(module, filter=None)
-        for _, value in members:
-            base = _get_base(value)
-            decorator_data = get_decorator_data(base)
-            if decorator_data is None:
+    for value in values:
+        module_name, _, qualname = value.partition(':')
+        module = importlib.import_module(module_name)
+        if qualname:
+            obj = module
+            for name in qualname.split('.'):
+                obj = get_attribute(obj, name)
+
+            decorator_data = get_decorator_data(_get_base(obj))
+            if decorator_data is not None:
+                out.extend(decorator_data.patches)
+
+            continue
+
+        file_path = getattr(module, '__file__', None)
+        file_stamp = _get_file_stamp(file_path)
+        entry = entries.get(module_name)
+        if _is_cache_entry_valid(entry, file_path, file_stamp):
+            patches = _get_cached_module_patches(module, entry['members'])
+            if patches is not None:
+                out.extend(patches)
                 continue
 
-            out.extend(decorator_data.patches)
+        patches, paths = _get_module_patches(module)
+        out.extend(patches)
+        if file_stamp is not None:
+            entries[module_name] = _make_cache_entry(file_path, file_stamp,
+                                                     paths)
+            updated = True
+
+    if updated and cache is not None:
+        _write_cache(cache, entries)
+
+    return out
+
+
+def compile_plan(patch_sets, path):
+    """Compile patch sets into a plan file.
+
+    The destinations and the objects of the patches are stored as paths in the
+    form ``'module:qualname'``, along with their settings and the id of their
+    set, in the order in which they need to be applied. The modules referred
+    to are fingerprinted so that the plan can be checked when loading it. The
+    file of a destination module that isn't imported yet is located without
+    importing that module, although its parent packages might be.
+
+    Parameters
+    ----------
+    patch_sets : list of gorilla.PatchSet
+        Patch sets, in the order in which they need to be applied.
+    path : str
+        Path to the plan file. The file is created or replaced.
+
+    Raises
+    ------
+    ValueError
+        A destination or an object can't be retrieved back from its path, and
+        the object isn't a string, a number, a boolean, or ``None`` either,
+        some settings can't be serialized, or a module referred to can't be
+        fingerprinted.
+
+    Note
+    ----
+    The paths of the objects nested within classes, such as methods, are
+    built from their qualified name, which is only available from Python 3
+    onwards. With Python 2, only the objects defined at the top level of
+    their module can be compiled.
+
+    See Also
+    --------
+    :func:`load_plan`.
+    """
+    settings_table = []
+    settings_indices = {}
+    modules = set()
+    sets = []
+    for patch_set in patch_sets:
+        entries = []
+        for patch in patch_set.patches:
+            destination = patch.destination
+            if not isinstance(destination, _STRING_TYPES):
+                destination = _get_path(destination)
+                if destination is None:
+                    raise ValueError(
+                        "The destination of the patch '{}' can't be "
+                        "retrieved from a path.".format(patch.name))
+
+            obj = _get_path(patch.obj)
+            if obj is not None:
+                modules.add(obj.partition(':')[0])
+            elif isinstance(patch.obj, _LITERAL_TYPES):
+                obj = {'value': patch.obj}
+            else:
+                raise ValueError(
+                    "The object of the patch '{}' can't be retrieved from a "
+                    "path.".format(patch.name))
+
+            settings = (None if patch.settings is None
+                        else _get_state(patch.settings))
+            try:
+                key = json.dumps(settings, sort_keys=True)
+            except TypeError:
+                raise ValueError(
+                    "The settings of the patch '{}' can't be serialized."
+                    .format(patch.name))
+
+            index = settings_indices.get(key)
+            if index is None:
+                index = settings_indices[key] = len(settings_table)
+                settings_table.append(settings)
+
+            modules.add(destination.partition(':')[0])
+            entries.append([destination, patch.name, obj, index])
+
+        sets.append([patch_set.id, entries])
+
+    fingerprint = {}
+    for module_name in modules:
+        module = sys.modules.get(module_name)
+        if module is None:
+            try:
+                file_path = _find_module_file(module_name)
+            except ImportError:
+                raise ValueError(
+                    "The module '{}' can't be found.".format(module_name))
+        else:
+            file_path = getattr(module, '__file__', None)
+
+        stamp = _get_file_stamp(file_path)
+        if file_path is not None and stamp is None:
+            raise ValueError(
+                "The module '{}' can't be fingerprinted.".format(module_name))
+
+        fingerprint[module_name] = [file_path, stamp]
+
+    data = {
+        'version': _PLAN_VERSION,
+        'fingerprint': fingerprint,
+        'settings': settings_table,
+        'sets': sets,
+    }
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, sort_keys=True, separators=(',', ':'))
+
+    _replace_file(tmp_path, path)
+
+
+def load_plan(path):
+    """Load the patch sets of a plan file.
+
+    No module is searched for patches. Only the modules defining the objects
+    of the patches are imported. The destinations are left described by
+    their path, thus their modules are only imported when applying the
+    patch sets. Patch sets never defer their patches.
+
+    Parameters
+    ----------
+    path : str
+        Path to the plan file.
+
+    Returns
+    -------
+    list of gorilla.PatchSet
+        The patch sets, in the order in which they need to be applied.
+
+    Raises
+    ------
+    RuntimeError
+        The plan has an unsupported format or is out of date since one of the
+        modules that it refers to has changed.
+
+    See Also
+    --------
+    :func:`compile_plan`.
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    if not isinstance(data, dict) or data.get('version') != _PLAN_VERSION:
+        raise RuntimeError(
+            "The plan file '{}' has an unsupported format.".format(path))
+
+    for module_name, (file_path, stamp) in _iteritems(data['fingerprint']):
+        if _get_file_stamp(file_path) != stamp:
+            raise RuntimeError(
+                "The plan file '{}' is out of date since the module '{}' "
+                "has changed.".format(path, module_name))
+
+    settings_table = [None if settings is None
+                      else _share_settings(Settings(**settings))
+                      for settings in data['settings']]
+    cache = {}
+    out = []
+    for patch_id, entries in data['sets']:
+        patches = []
+        for destination, name, obj, index in entries:
+            obj = (obj['value'] if isinstance(obj, dict)
+                   else _resolve_path(obj, cache))
+            patches.append(Patch(destination, name, obj,
+                                 settings=settings_table[index]))
+
+        out.append(PatchSet(patches, id=patch_id))
+
+    return out
+
+
+def load_manifest(path):
+    """Create the patches described by a manifest file.
+
+    The manifest is a TOML file if its extension is ``.toml``, or a JSON file
+    otherwise. It defines a ``patches`` array of tables, each describing a
+    patch through the following keys:
+
+    - ``destination``: path of the destination in the form
+      ``'module:qualname'``;
+    - ``name``: name of the attribute at the destination, defaulting to the
+      name of the object;
+    - ``object``: path of the object in the form ``'module:qualname'``;
+    - ``settings``: table of settings, optional.
+
+    For example:
+
+    .. code-block:: toml
+
+       [[patches]]
+       destination = "package.module:Class"
+       name = "method"
+       object = "fixes:method"
+       settings = { allow_hit = true }
+
+    Parameters
+    ----------
+    path : str
+        Path to the manifest file.
+
+    Returns
+    -------
+    list of gorilla.Patch
+        The patches, in the order of the manifest.
+
+    Raises
+    ------
+    ValueError
+        An entry of the manifest is invalid.
+    RuntimeError
+        Neither the ``tomllib`` module nor the ``tomli`` distribution is
+        available to read a TOML manifest.
+
+    Note
+    ----
+    Only the modules defining the objects are imported. The destinations are
+    left described by their path, thus their modules are only imported when
+    applying the patches, or later on if the patches are deferred.
+    """
+    if os.path.splitext(path)[1] == '.toml':
+        if _toml is None:
+            raise RuntimeError(
+                "Reading a TOML manifest requires the 'tomllib' module or "
+                "the 'tomli' distribution.")
+
+        with open(path, 'rb') as f:
+            data = _toml.load(f)
+    else:
+        with open(path, 'r') as f:
+            data = json.load(f)
+
+    entries = data.get('patches', []) if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        raise ValueError(
+            "The manifest '{}' needs to define an array of patches."
+            .format(path))
+
+    cache = {}
+    out = []
+    for i, entry in enumerate(entries):
+        if (not isinstance(entry, dict)
+                or any(key not in _MANIFEST_KEYS for key in entry)
+                or not isinstance(entry.get('destination'), _STRING_TYPES)
+                or not isinstance(entry.get('object'), _STRING_TYPES)
+                or not isinstance(entry.get('settings', {}), dict)):
+            raise ValueError(
+                "The patch at the index {} of the manifest '{}' is invalid. "
+                "It requires a 'destination' and an 'object' paths, and "
+                "optionally a 'name' and a table of 'settings'."
+                .format(i, path))
+
+        obj = _resolve_path(entry['object'], cache)
+        name = entry.get('name')
+        if name is None:
+            name = entry['object'].rpartition(':')[2].rpartition('.')[2]
+
+        settings = entry.get('settings')
+        if settings is not None:
+            settings = _share_settings(Settings(**settings))
+
+        out.append(Patch(entry['destination'], name, obj, settings=settings))
 
     return out
 
@@ -695,12 +1909,31 @@ def get_attribute(obj, name):
     .. |getattr()| replace:: ``getattr()``
     .. _getattr(): https://docs.python.org/library/functions.html#getattr
     """
-    objs = inspect.getmro(obj) if isinstance(obj, _CLASS_TYPES) else [obj]
-    for obj_ in objs:
+    if not isinstance(obj, _CLASS_TYPES):
         try:
-            return object.__getattribute__(obj_, name)
+            return object.__getattribute__(obj, name)
         except AttributeError:
             pass
+    else:
+        objs = inspect.getmro(obj)
+        for base in type(obj).__mro__:
+            if name in base.__dict__:
+                # Attributes defined by the metaclass might be descriptors
+                # taking precedence over the class' own dictionary.
+                for obj_ in objs:
+                    try:
+                        return object.__getattribute__(obj_, name)
+                    except AttributeError:
+                        pass
+
+                break
+        else:
+            # The dictionaries are searched directly otherwise, which avoids
+            # raising an exception for each class missing the attribute.
+            for obj_ in objs:
+                dict_ = obj_.__dict__
+                if name in dict_:
+                    return dict_[name]
 
     raise AttributeError("'{}' object has no attribute '{}'"
                          .format(type(obj), name))
@@ -732,24 +1965,18 @@ def get_original_attribute(obj, name, id='default'):
     --------
     :attr:`Settings.allow_hit`.
     """
-    original_ids = _ORIGINAL_IDS.format(name)
-    try:
-        ids = getattr(obj, original_ids)
-        if not ids:
-            raise AttributeError
-    except AttributeError:
+    owner, out = _find_original_attribute(obj, name, id)
+    if owner is None:
         raise AttributeError(
             "Cannot retrieve the attribute named '{}' since the setting "
             "'store_hit' was not set to True when applying the patch."
             .format(obj.__name__))
 
-    for i, original_id in reversed(tuple(enumerate(ids))):
-        if original_id == id:
-            original_item = _ORIGINAL_ITEM.format(name, i)
-            return getattr(obj, original_item)
+    if out is _MISSING:
+        raise AttributeError(
+            "No original attribute found  matching the id '{}'.".format(id))
 
-    raise AttributeError(
-        "No original attribute found  matching the id '{}'.".format(id))
+    return out
 
 
 def get_decorator_data(obj, set_default=False):
@@ -775,6 +2002,7 @@ def get_decorator_data(obj, set_default=False):
             data = DecoratorData()
             datas[obj] = data
             setattr(obj, _DECORATOR_DATA, datas)
+            _clear_member_cache(obj)
     else:
         data = getattr(obj, _DECORATOR_DATA, None)
         if data is None and set_default:
@@ -784,6 +2012,24 @@ def get_decorator_data(obj, set_default=False):
     return data
 
 
+def _release_decorator_data(obj):
+    """Remove the decorator data from an object, if any."""
+    if isinstance(obj, _CLASS_TYPES):
+        # The data of the classes are stored in a dictionary possibly shared
+        # with their subclasses.
+        datas = getattr(obj, _DECORATOR_DATA, None)
+        if datas is None:
+            return
+
+        datas.pop(obj, None)
+        if (_DECORATOR_DATA in obj.__dict__
+                and all(data is None for data in datas.values())):
+            delattr(obj, _DECORATOR_DATA)
+            _clear_member_cache(obj)
+    elif hasattr(obj, _DECORATOR_DATA):
+        delattr(obj, _DECORATOR_DATA)
+
+
 def _get_base(obj):
     """Unwrap decorators to retrieve the base object."""
     if hasattr(obj, '__func__'):
@@ -800,46 +2046,165 @@ def _get_base(obj):
     return _get_base(obj)
 
 
+def _get_state(obj):
+    """Retrieve the attributes of a slotted object, including any extra one.
+
+    The slots are expected to be defined by the object's type itself. Private
+    slots are skipped.
+    """
+    out = dict(obj.__dict__)
+    for name in type(obj).__slots__:
+        if not name.startswith('_'):
+            out[name] = getattr(obj, name)
+
+    return out
+
+
+def _iter_unique(iterable):
+    """Iterate over the first occurrence of each element, in order."""
+    seen = set()
+    for element in iterable:
+        if element not in seen:
+            seen.add(element)
+            yield element
+
+
+def _share_settings(settings):
+    """Retrieve a read-only copy of some settings.
+
+    Equal settings share a same copy, as long as their values are hashable.
+    """
+    if settings is None or settings._shared:
+        return settings
+
+    try:
+        key = tuple(sorted(_iteritems(_get_state(settings))))
+        out = _SHARED_SETTINGS.get(key)
+    except TypeError:
+        key = None
+        out = None
+
+    if out is None:
+        out = copy.deepcopy(settings)
+        object.__setattr__(out, '_shared', True)
+        if key is not None:
+            _SHARED_SETTINGS[key] = out
+
+    return out
+
+
 def _get_members(obj, traverse_bases=True, filter=default_filter,
                  recursive=True):
     """Retrieve the member attributes of a module or a class.
 
     The descriptor protocol is bypassed.
     """
+    return [(path[-1], value)
+            for path, value in _get_member_paths(
+                obj, traverse_bases=traverse_bases, filter=filter,
+                recursive=recursive)]
+
+
+def _get_member_paths(obj, traverse_bases=True, filter=default_filter,
+                      recursive=True):
+    """Retrieve the member attributes of a module or a class with their path.
+
+    Each path is a tuple of the attribute names leading to the member. The
+    members are ordered as per :func:`_get_members`.
+    """
     if filter is None:
         filter = _true
 
     out = []
-    stack = collections.deque((obj,))
+    stack = collections.deque(((obj, ()),))
     while stack:
-        obj = stack.popleft()
-        if traverse_bases and isinstance(obj, _CLASS_TYPES):
-            roots = [base for base in inspect.getmro(obj)
-                     if base not in (type, object)]
+        obj, path = stack.popleft()
+        if isinstance(obj, _CLASS_TYPES):
+            members = _get_class_members(obj, traverse_bases)
         else:
-            roots = [obj]
+            members = sorted(_iteritems(getattr(obj, '__dict__', {})))
 
-        members = []
-        seen = set()
-        for root in roots:
-            for name, value in _iteritems(getattr(root, '__dict__', {})):
-                if name not in seen and filter(name, value):
-                    members.append((name, value))
-
-                seen.add(name)
+        for name, value in members:
+            if not filter(name, value):
+                continue
 
-        members = sorted(members)
-        for _, value in members:
             if recursive and isinstance(value, _CLASS_TYPES):
-                stack.append(value)
+                stack.append((value, path + (name,)))
+
+            out.append((path + (name,), value))
+
+    return out
 
-        out.extend(members)
 
+def _get_class_members(cls, traverse_bases):
+    """Retrieve the member attributes of a class, sorted by name."""
+    mro = inspect.getmro(cls)
+    dicts = [base.__dict__ for base in mro]
+    try:
+        return [(name, dicts[index][name])
+                for name, index in _get_class_layout(cls, mro, traverse_bases)]
+    except KeyError:
+        # A member was deleted without going through the patching process.
+        _MEMBER_CACHE.clear()
+        return _get_class_members(cls, traverse_bases)
+
+
+def _get_class_layout(cls, mro, traverse_bases):
+    """Retrieve the sorted names of the members of a class with their owner.
+
+    The owner of each member is given as the position of the class defining it
+    within the method resolution order.
+
+    The output is cached for as long as the class is alive, its method
+    resolution order is unchanged, and no class is patched. Only the names
+    and the positions are cached since the members themselves, such as the
+    descriptors of the class or the methods calling ``super()``, might
+    reference the class and would thus keep it alive.
+    """
+    mro_ids = tuple(id(base) for base in mro)
+    key = (id(cls), traverse_bases)
+    cached = _MEMBER_CACHE.get(key)
+    if cached is not None and cached[0]() is cls and cached[1] == mro_ids:
+        return cached[2]
+
+    if not traverse_bases:
+        roots = [0]
+        members = {}
+    elif cls in (type, object):
+        roots = []
+        members = {}
+    elif len(mro) > 1 and inspect.getmro(mro[1]) == mro[1:]:
+        # The members of the class extend the ones of its first base when
+        # this base alone resolves the rest of the method resolution order.
+        roots = [0]
+        members = {name: index + 1
+                   for name, index in _get_class_layout(mro[1], mro[1:], True)}
+    else:
+        roots = [index for index, base in enumerate(mro)
+                 if base not in (type, object)]
+        members = {}
+
+    for index in reversed(roots):
+        members.update(dict.fromkeys(getattr(mro[index], '__dict__', {}),
+                                     index))
+
+    # The members inherited are already sorted, which speeds up the sort.
+    out = tuple(sorted(_iteritems(members)))
+    try:
+        ref = weakref.ref(cls, lambda _: _MEMBER_CACHE.pop(key, None))
+    except TypeError:
+        return out
+
+    _MEMBER_CACHE[key] = (ref, mro_ids, out)
     return out
 
 
 def _module_iterator(root, recursive=True):
-    """Iterate over modules."""
+    """Iterate over modules.
+
+    The subpackages are neither imported nor iterated over if ``recursive`` is
+    ``False``.
+    """
     yield root
 
     stack = collections.deque((root,))
@@ -851,19 +2216,1101 @@ def _module_iterator(root, recursive=True):
         for path in paths:
             modules = pkgutil.iter_modules([path])
             for finder, name, is_package in modules:
+                if is_package and not recursive:
+                    continue
+
                 module_name = '{}.{}'.format(package.__name__, name)
                 module = sys.modules.get(module_name, None)
                 if module is None:
                     # Import the module through the finder to support package
                     # namespaces.
                     module = _load_module(finder, module_name)
+                    # The finders of 'sys.meta_path' are bypassed, including
+                    # the one applying the deferred patches.
+                    _apply_deferred(module_name)
+
+                if is_package:
+                    stack.append(module)
+
+                yield module
+
+
+def _module_location_iterator(root, recursive=True):
+    """Iterate over the locations of modules without importing them.
 
+    Each location is a tuple made of the name of the module and of the path to
+    its file, or ``None``. The modules are iterated in the same order as per
+    :func:`_module_iterator`.
+    """
+    yield (root.__name__, getattr(root, '__file__', None))
+
+    paths = getattr(root, '__path__', [])
+    stack = collections.deque(((root.__name__, paths),))
+    while stack:
+        package_name, paths = stack.popleft()
+        for path in paths:
+            modules = pkgutil.iter_modules([path])
+            for finder, name, is_package in modules:
+                module_name = '{}.{}'.format(package_name, name)
+                file_path, locations = _find_module_location(finder,
+                                                             module_name)
                 if is_package:
                     if recursive:
-                        stack.append(module)
-                        yield module
+                        # Rely on the packages already imported to support
+                        # package namespaces.
+                        module = sys.modules.get(module_name, None)
+                        if module is not None:
+                            locations = getattr(module, '__path__', locations)
+
+                        stack.append((module_name, locations or []))
+                        yield (module_name, file_path)
                 else:
-                    yield module
+                    yield (module_name, file_path)
+
+
+def _get_module_patches(module, release=False):
+    """Retrieve the patches defined by the members of a module.
+
+    The output is a tuple made of the patches and of the paths of the members
+    defining them. The decorator data of these members is removed if
+    ``release`` is ``True``.
+    """
+    patches = []
+    paths = []
+    bases = []
+    for path, value in _get_member_paths(module, filter=None):
+        base = _get_base(value)
+        decorator_data = get_decorator_data(base)
+        if decorator_data is None or not decorator_data.patches:
+            continue
+
+        patches.extend(decorator_data.patches)
+        paths.append(path)
+        bases.append(base)
+
+    if release:
+        for base in bases:
+            _release_decorator_data(base)
+
+    return (patches, paths)
+
+
+def _iter_patches_selectively(modules, recursive, cache, static, release,
+                              workers):
+    """Iterate over the patches while only importing the modules defining some.
+
+    The modules to import are determined through a cache file and/or through
+    a static analysis of their source.
+    """
+    entries = {} if cache is None else _read_cache(cache)
+    updated = False
+    locations = (location
+                 for package in modules
+                 for location in _module_location_iterator(
+                     package, recursive=recursive))
+    if workers:
+        # The modules cached as not defining any patch are left out.
+        _prefetch_modules(modules, recursive, workers,
+                          skip={module_name
+                                for module_name, entry in _iteritems(entries)
+                                if not entry.get('members', True)})
+
+    for module_name, file_path in locations:
+        stamp = _get_file_stamp(file_path)
+        entry = entries.get(module_name)
+        matched = _is_cache_entry_valid(entry, file_path, stamp)
+        if matched:
+            if not entry['members']:
+                continue
+
+            module = importlib.import_module(module_name)
+            patches = _get_cached_module_patches(module, entry['members'],
+                                                 release)
+            if patches is not None:
+                for patch in patches:
+                    yield patch
+
+                continue
+
+        if static and not _refers_to_patch_decorators(file_path):
+            patches, paths = ([], [])
+        else:
+            module = importlib.import_module(module_name)
+            patches, paths = _get_module_patches(module, release)
+
+        for patch in patches:
+            yield patch
+
+        # An entry matching an unchanged source is kept if its members don't
+        # define patches anymore since their decorator data was most likely
+        # released by an earlier search.
+        if stamp is not None and not (matched and not paths):
+            entries[module_name] = _make_cache_entry(file_path, stamp, paths)
+            updated = True
+
+    if updated and cache is not None:
+        _write_cache(cache, entries)
+
+
+def _prefetch_modules(modules, recursive, workers, skip=()):
+    """Read the source and bytecode files of modules on a thread pool.
+
+    The contents are discarded, the point being for the operating system to
+    cache the files before the modules are imported one at a time. The
+    packages are walked by listing their directories only, the modules
+    already imported or whose name is in ``skip`` are left out.
+    """
+    paths = []
+    stack = collections.deque((package.__name__,
+                               getattr(package, '__path__', []))
+                              for package in modules)
+    while stack:
+        package_name, directories = stack.popleft()
+        for directory in directories:
+            try:
+                names = sorted(os.listdir(directory))
+            except OSError:
+                continue
+
+            for name in names:
+                path = os.path.join(directory, name)
+                if name.endswith('.py'):
+                    if name == '__init__.py':
+                        continue
+
+                    module_name = '{}.{}'.format(package_name, name[:-3])
+                elif (recursive and '.' not in name and name != '__pycache__'
+                      and os.path.isfile(os.path.join(path, '__init__.py'))):
+                    module_name = '{}.{}'.format(package_name, name)
+                    stack.append((module_name, [path]))
+                    path = os.path.join(path, '__init__.py')
+                else:
+                    continue
+
+                if module_name in sys.modules or module_name in skip:
+                    continue
+
+                paths.append(path)
+                bytecode_path = _get_bytecode_path(path)
+                if bytecode_path is not None:
+                    paths.append(bytecode_path)
+
+    if not paths:
+        return
+
+    pool = multiprocessing.pool.ThreadPool(workers)
+    try:
+        pool.map(_read_file, paths,
+                 chunksize=max(len(paths) // (workers * 4), 1))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _read_file(path):
+    """Read a file, if it exists."""
+    try:
+        with open(path, 'rb') as f:
+            f.read()
+    except (IOError, OSError):
+        pass
+
+
+def _refers_to_patch_decorators(path):
+    """Check whether the source of a module refers to the patch decorators.
+
+    The module is assumed to refer to them if its source couldn't be parsed.
+    """
+    if path is None or not path.endswith('.py'):
+        return True
+
+    try:
+        with open(path, 'rb') as f:
+            source = f.read()
+    except (IOError, OSError):
+        return True
+
+    # Most modules can be discarded without having to be parsed.
+    if b'gorilla' not in source:
+        return False
+
+    try:
+        tree = ast.parse(source, path)
+    except (SyntaxError, TypeError, ValueError):
+        return True
+
+    modules = set()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.asname or alias.name for alias in node.names
+                           if alias.name == __name__)
+        elif isinstance(node, ast.ImportFrom) and node.module == __name__:
+            for alias in node.names:
+                if alias.name == '*':
+                    names.update(_PATCH_DECORATORS)
+                elif alias.name in _PATCH_DECORATORS:
+                    names.add(alias.asname or alias.name)
+
+    if not modules and not names:
+        return False
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute):
+            if (node.attr in _PATCH_DECORATORS
+                    and isinstance(node.value, ast.Name)
+                    and node.value.id in modules):
+                return True
+        elif isinstance(node, ast.Name) and node.id in names:
+            return True
+
+    return False
+
+
+def _get_cached_module_patches(module, paths, release=False):
+    """Retrieve the patches defined by the members of a module at some paths.
+
+    ``None`` is returned if a member couldn't be found. The decorator data of
+    these members is removed if ``release`` is ``True``.
+    """
+    out = []
+    bases = []
+    for path in paths:
+        value = module
+        try:
+            for name in path:
+                value = get_attribute(value, name)
+        except AttributeError:
+            return None
+
+        base = _get_base(value)
+        decorator_data = get_decorator_data(base)
+        if decorator_data is None:
+            return None
+
+        out.extend(decorator_data.patches)
+        bases.append(base)
+
+    if release:
+        for base in bases:
+            _release_decorator_data(base)
+
+    return out
+
+
+def _get_entry_point_values(group):
+    """Retrieve the values of the entry points of a group, sorted by name.
+
+    The extras are stripped from the values, which are in the form
+    ``'module'`` or ``'module:qualname'``.
+    """
+    if _metadata is None:
+        raise RuntimeError(
+            "Finding the entry points requires the 'importlib.metadata' "
+            "module or the 'importlib_metadata' distribution.")
+
+    entry_points = _metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        entry_points = entry_points.select(group=group)
+    else:
+        entry_points = entry_points.get(group, ())
+
+    return [''.join(entry_point.value.partition('[')[0].split())
+            for entry_point in sorted(entry_points,
+                                      key=lambda x: (x.name, x.value))]
+
+
+def _get_file_stamp(path):
+    """Retrieve the modification time and the size of a file, if any."""
+    if path is None:
+        return None
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return [stat.st_mtime, stat.st_size]
+
+
+def _is_cache_entry_valid(entry, path, stamp):
+    """Check whether a cache entry matches the current stamp of a file."""
+    return (stamp is not None and entry is not None
+            and entry.get('path') == path and entry.get('stamp') == stamp)
+
+
+def _make_cache_entry(path, stamp, member_paths):
+    """Make the cache entry of a module."""
+    return {
+        'path': path,
+        'stamp': stamp,
+        'members': [list(member_path) for member_path in member_paths],
+    }
+
+
+def _read_cache(path):
+    """Read the entries of a cache file, if any."""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+    if not isinstance(data, dict) or data.get('version') != _CACHE_VERSION:
+        return {}
+
+    return data.get('entries', {})
+
+
+def _write_cache(path, entries):
+    """Write the entries of a cache file.
+
+    The file is replaced atomically to support concurrent processes.
+    """
+    data = {'version': _CACHE_VERSION, 'entries': entries}
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, sort_keys=True)
+
+    _replace_file(tmp_path, path)
+
+
+def _prepare(patches, patch_id):
+    """Resolve the attributes to set for a batch of patches.
+
+    No attribute is modified. The output is a tuple made of the attributes to
+    set, of the ledger entries to add, and of the destinations, all keyed by
+    the identity of the destinations since these might not be hashable.
+    """
+    settings = Settings()
+
+    # The attributes to set are also used to resolve the targets of the patches
+    # stacked on top of each other within the batch.
+    pending = {}
+    ledger = {}
+    destinations = {}
+    cache = {}
+    for patch in patches:
+        settings_ = settings if patch.settings is None else patch.settings
+        destination = patch.destination
+        name = patch.name
+        target = _resolve_attribute(destination, name, pending, cache)
+        if target is not _MISSING and not settings_.allow_hit:
+            raise _get_hit_error(patch)
+
+        key = id(destination)
+        values = pending.get(key)
+        if values is None:
+            values = pending[key] = {}
+            ledger[key] = {}
+            destinations[key] = destination
+
+        if target is _MISSING:
+            obj = patch.obj
+        else:
+            obj = _bind_original_attribute(patch.obj, target)
+
+        if target is _MISSING or settings_.store_hit:
+            ledger[key].setdefault(name, []).append(
+                (patch_id, target, patch.obj))
+
+        values[name] = obj
+
+    return (pending, ledger, destinations)
+
+
+def _commit(pending, ledger, destinations):
+    """Set the attributes resolved by :func:`_prepare`.
+
+    The output is an undo log that can be passed to :func:`_rollback`. If an
+    error occurs, the attributes already set are restored.
+    """
+    undo = []
+    try:
+        for key, values in _iteritems(pending):
+            destination = destinations[key]
+            own = getattr(destination, '__dict__', {})
+            entries = {name: _get_ledger_entries(destination, name)
+                       for name in ledger[key]}
+            undo.append((destination,
+                         {name: own.get(name, _MISSING) for name in values},
+                         entries))
+            _set_attributes(destination, values)
+            for name, new_entries in _iteritems(ledger[key]):
+                _set_ledger_entries(destination, name,
+                                    entries[name] + tuple(new_entries))
+    except Exception:
+        # Any error from the restoration is discarded in favour of the
+        # original one.
+        _rollback(undo)
+        raise
+
+    return undo
+
+
+def _rollback(undo):
+    """Restore the attributes recorded by :func:`_commit`.
+
+    The restoration carries on past the attributes that fail to be restored,
+    and the first error encountered is returned, if any.
+    """
+    error = None
+    for destination, values, entries in reversed(undo):
+        own = getattr(destination, '__dict__', {})
+        values = {name: value for name, value in _iteritems(values)
+                  if value is not _MISSING or name in own}
+        try:
+            _set_attributes(destination, values)
+        except Exception:
+            # Restore the attributes one at a time to skip the failing ones.
+            for name, value in _iteritems(values):
+                try:
+                    _set_attributes(destination, {name: value})
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+        for name, entries_ in _iteritems(entries):
+            _set_ledger_entries(destination, name, entries_)
+
+    return error
+
+
+def _bind_original_attribute(obj, original):
+    """Bind an original attribute to the ``__original__`` parameter of a patch.
+
+    The input object is returned unchanged if it doesn't define such a
+    parameter with a default value.
+    """
+    func = obj
+    wrapper = None
+    if isinstance(obj, (classmethod, staticmethod)):
+        func = obj.__func__
+        wrapper = type(obj)
+
+    if (not isinstance(func, types.FunctionType)
+            or _ORIGINAL_PARAMETER not in func.__code__.co_varnames):
+        return obj
+
+    original = _get_base(original)
+    defaults = func.__defaults__
+    kwdefaults = getattr(func, '__kwdefaults__', None)
+    if kwdefaults and _ORIGINAL_PARAMETER in kwdefaults:
+        kwdefaults = dict(kwdefaults)
+        kwdefaults[_ORIGINAL_PARAMETER] = original
+    else:
+        code = func.__code__
+        names = code.co_varnames[:code.co_argcount]
+        if not defaults or _ORIGINAL_PARAMETER not in names:
+            return obj
+
+        i = names.index(_ORIGINAL_PARAMETER) - len(names) + len(defaults)
+        if i < 0:
+            return obj
+
+        defaults = defaults[:i] + (original,) + defaults[i + 1:]
+
+    out = types.FunctionType(func.__code__, func.__globals__, func.__name__,
+                             defaults, func.__closure__)
+    if kwdefaults:
+        out.__kwdefaults__ = dict(kwdefaults)
+
+    for attribute in ('__doc__', '__module__', '__qualname__',
+                      '__annotations__'):
+        if hasattr(func, attribute):
+            setattr(out, attribute, getattr(func, attribute))
+
+    out.__dict__.update(func.__dict__)
+    return out if wrapper is None else wrapper(out)
+
+
+def _get_hit_error(patch):
+    """Build the error raised when a patch hits an attribute unexpectedly."""
+    return RuntimeError(
+        "An attribute named '{}' already exists at the destination "
+        "'{}'. Set a different name through the patch object to avoid "
+        "a name clash or set the setting 'allow_hit' to True to "
+        "overwrite the attribute. In the latter case, it is "
+        "recommended to also set the 'store_hit' setting to True in "
+        "order to store the original attribute aside so it can still "
+        "be accessed."
+        .format(patch.name, patch.destination.__name__))
+
+
+def _resolve_attribute(obj, name, overlay, cache):
+    """Retrieve an attribute while taking pending assignments into account.
+
+    The overlay maps the identity of the objects to dictionaries of attributes
+    that are yet to be assigned. The cache is a dictionary private to the
+    caller that holds the lookup chains of the objects encountered.
+    ``_MISSING`` is returned if the attribute couldn't be found.
+    """
+    key = id(obj)
+    chain = cache.get(key)
+    if chain is None:
+        objs = (inspect.getmro(obj) if isinstance(obj, _CLASS_TYPES)
+                else (obj,))
+        chain = [(id(obj_), obj_, getattr(obj_, '__dict__', {}),
+                  _get_type_attributes(type(obj_), cache))
+                 for obj_ in objs]
+        cache[key] = chain
+
+    for key_, obj_, dict_, type_attributes in chain:
+        values = overlay.get(key_)
+        if values is not None and name in values:
+            return values[name]
+
+        if name in type_attributes:
+            # Attributes defined by the type might be descriptors taking
+            # precedence over the object's own dictionary.
+            try:
+                return object.__getattribute__(obj_, name)
+            except AttributeError:
+                continue
+
+        value = dict_.get(name, _MISSING)
+        if value is not _MISSING:
+            return value
+
+    return _MISSING
+
+
+def _get_type_attributes(cls, cache):
+    """Retrieve the names of the attributes defined by a type and its bases."""
+    key = ('type', id(cls))
+    out = cache.get(key)
+    if out is None:
+        out = frozenset(name
+                        for base in inspect.getmro(cls)
+                        for name in getattr(base, '__dict__', ()))
+        cache[key] = out
+
+    return out
+
+
+def _set_attributes(obj, values):
+    """Set multiple attributes on an object.
+
+    The attributes having the value ``_MISSING`` are deleted.
+    """
+    _clear_member_cache(obj)
+    items = _iteritems(values)
+    if type(obj) is types.ModuleType:
+        # The dictionary of plain modules can be updated directly since there
+        # is no descriptor to honour, except for special attributes.
+        items = []
+        dict_ = obj.__dict__
+        for key, value in _iteritems(values):
+            if key.startswith('__'):
+                items.append((key, value))
+            elif value is _MISSING:
+                del dict_[key]
+            else:
+                dict_[key] = value
+
+    for key, value in items:
+        if value is _MISSING:
+            delattr(obj, key)
+        else:
+            setattr(obj, key, value)
+
+
+def _clear_member_cache(obj):
+    """Clear the cached members of the classes if an object is a class."""
+    if isinstance(obj, _CLASS_TYPES):
+        _MEMBER_CACHE.clear()
+
+
+class _Record(object):
+    """Ledger record of the original attributes stored for a destination.
+
+    The record is stored on the destination itself so that it is discarded
+    along with it.
+    """
+
+    def __init__(self):
+        # Map each attribute name to a tuple of entries made of the id of the
+        # patch, of the original attribute, or ``_MISSING`` if the patch
+        # created the attribute, and of the patch object, from the bottom of
+        # the stack to its top.
+        self.entries = {}
+
+        # Map each attribute name to an index of the topmost original
+        # attribute stored for each patch id.
+        self.originals = {}
+
+
+def _get_record(obj):
+    """Retrieve the ledger record stored on a destination, if any."""
+    return getattr(obj, '__dict__', {}).get(_LEDGER_RECORD)
+
+
+def _add_record(obj):
+    """Store a new ledger record on a destination."""
+    key = id(obj)
+    try:
+        _LEDGER[key] = weakref.ref(obj, lambda _: _discard_record(key))
+    except TypeError:
+        _LEDGER[key] = lambda: obj
+
+    record = _Record()
+    setattr(obj, _LEDGER_RECORD, record)
+    _clear_member_cache(obj)
+    return record
+
+
+def _remove_record(obj, record):
+    """Remove the ledger record stored on a destination."""
+    key = id(obj)
+    for name, entries in _iteritems(record.entries):
+        for patch_id in {entry[0] for entry in entries}:
+            _discard_ledger_location(patch_id, (key, name))
+
+    del _LEDGER[key]
+    delattr(obj, _LEDGER_RECORD)
+    _clear_member_cache(obj)
+
+
+def _discard_record(key):
+    """Discard the locations of a destination that no longer exists."""
+    _LEDGER.pop(key, None)
+    for patch_id, locations in list(_iteritems(_LEDGER_IDS)):
+        for location in [location for location in locations
+                         if location[0] == key]:
+            _discard_ledger_location(patch_id, location)
+
+
+def _discard_ledger_location(patch_id, location):
+    """Discard the location of some ledger entries of a patch id."""
+    locations = _LEDGER_IDS[patch_id]
+    locations.discard(location)
+    if not locations:
+        del _LEDGER_IDS[patch_id]
+
+
+def _get_ledger_entries(obj, name):
+    """Retrieve the ledger entries of an attribute stored on a destination."""
+    record = _get_record(obj)
+    if record is None:
+        return ()
+
+    return record.entries.get(name, ())
+
+
+def _set_ledger_entries(obj, name, entries):
+    """Replace the ledger entries of an attribute stored on a destination.
+
+    Records left empty are discarded.
+    """
+    _ORIGINAL_CACHE.clear()
+    key = id(obj)
+    record = _get_record(obj)
+    old_entries = () if record is None else record.entries.get(name, ())
+    old_ids = {entry[0] for entry in old_entries}
+    new_ids = {entry[0] for entry in entries}
+    for patch_id in old_ids - new_ids:
+        _discard_ledger_location(patch_id, (key, name))
+
+    for patch_id in new_ids - old_ids:
+        _LEDGER_IDS.setdefault(patch_id, set()).add((key, name))
+
+    if entries:
+        if record is None:
+            record = _add_record(obj)
+
+        record.entries[name] = entries
+        record.originals[name] = {
+            patch_id: original for patch_id, original, _ in entries
+            if original is not _MISSING}
+    elif record is not None:
+        record.entries.pop(name, None)
+        record.originals.pop(name, None)
+        if not record.entries:
+            _remove_record(obj, record)
+
+
+def _reset_ledger_record(obj, entries):
+    """Replace all the ledger entries stored on a destination at once."""
+    _ORIGINAL_CACHE.clear()
+    record = _get_record(obj)
+    if record is not None:
+        _remove_record(obj, record)
+
+    if not entries:
+        return
+
+    key = id(obj)
+    record = _add_record(obj)
+    for name, name_entries in _iteritems(entries):
+        record.entries[name] = name_entries
+        record.originals[name] = {
+            patch_id: original for patch_id, original, _ in name_entries
+            if original is not _MISSING}
+        for patch_id in {entry[0] for entry in name_entries}:
+            _LEDGER_IDS.setdefault(patch_id, set()).add((key, name))
+
+
+def _remove_ledger_entries(obj, name, indices):
+    """Revert the patches of an attribute's stack found at some indices.
+
+    The patches remaining above the ones removed are set again on top of their
+    new original attribute, thus binding it again to any ``__original__``
+    parameter. The attribute is only set if its value changes.
+    """
+    entries = _get_ledger_entries(obj, name)
+    out = []
+
+    # Value below the patch being processed, if it has changed.
+    below = _UNCHANGED
+    for i, entry in enumerate(entries):
+        patch_id, original, patch_obj = entry
+        if i in indices:
+            if below is _UNCHANGED:
+                below = original
+        elif below is _UNCHANGED:
+            out.append(entry)
+        else:
+            out.append((patch_id, below, patch_obj))
+            if below is _MISSING:
+                # The patch now creates the attribute.
+                below = patch_obj
+                continue
+
+            # The patches above are left untouched if this patch's value is
+            # the same as before.
+            value = _bind_original_attribute(patch_obj, below)
+            below = _UNCHANGED if value is patch_obj else value
+
+    if below is _MISSING:
+        delattr(obj, name)
+    elif below is not _UNCHANGED:
+        setattr(obj, name, below)
+
+    _clear_member_cache(obj)
+    _set_ledger_entries(obj, name, tuple(out))
+
+
+def _find_ledger_entries(obj, name):
+    """Find the ledger entries of an attribute accessible from an object.
+
+    As per the built-in ``getattr()`` function, the entries stored on the type
+    of the object and on any of its bases are also searched. The output is a
+    tuple made of the destination owning the entries and of the entries.
+    """
+    if isinstance(obj, _CLASS_TYPES):
+        objs = inspect.getmro(obj)
+    else:
+        objs = (obj,) + inspect.getmro(type(obj))
+
+    for obj_ in objs:
+        entries = _get_ledger_entries(obj_, name)
+        if entries:
+            return (obj_, entries)
+
+    return (None, ())
+
+
+def _bind_attribute(value, owner, obj):
+    """Bind an attribute stored on an owner as if retrieved from an object.
+
+    This honours the descriptor protocol in the same way as the built-in
+    ``getattr()`` function does for class attributes.
+    """
+    if not isinstance(owner, _CLASS_TYPES):
+        return value
+
+    getter = getattr(type(value), '__get__', None)
+    if getter is None:
+        return value
+
+    if isinstance(obj, _CLASS_TYPES):
+        return getter(value, None, obj)
+
+    return getter(value, obj, type(obj))
+
+
+def _find_original_attribute(obj, name, patch_id):
+    """Find an original attribute accessible from an object.
+
+    The output is a tuple made of the destination owning the original
+    attribute, or ``None`` if no entry could be found for the attribute, and of
+    the original attribute bound as if retrieved from the object, or
+    ``_MISSING`` if none matches the patch id.
+    """
+    # Instances are looked up through their type unless they are destinations.
+    cls = obj
+    if not isinstance(obj, _CLASS_TYPES) and id(obj) not in _LEDGER:
+        cls = type(obj)
+
+    key = (id(cls), name, patch_id)
+    cached = _ORIGINAL_CACHE.get(key)
+    owner = None if cached is None or cached[0]() is not cls else cached[1]()
+    if owner is None:
+        owner, entries = _find_ledger_entries(cls, name)
+        if owner is None:
+            return (None, _MISSING)
+
+        try:
+            _ORIGINAL_CACHE[key] = (
+                weakref.ref(cls, lambda _: _ORIGINAL_CACHE.pop(key, None)),
+                weakref.ref(owner))
+        except TypeError:
+            pass
+
+    original = _get_record(owner).originals[name].get(patch_id, _MISSING)
+    if original is _MISSING:
+        return (owner, _MISSING)
+
+    return (owner, _bind_attribute(original, owner, obj))
+
+
+def _resolve_patch(patch):
+    """Resolve the destination of a patch described by a path.
+
+    The destination module is imported if needed. A copy of the patch is
+    returned if its destination is resolved.
+    """
+    if not isinstance(patch.destination, _STRING_TYPES):
+        return patch
+
+    destination = _resolve_path(patch.destination)
+    return Patch(destination, patch.name, patch.obj, settings=patch.settings)
+
+
+def _resolve_path(path, cache=None):
+    """Retrieve the object described by a path ``'module:qualname'``.
+
+    The module is imported if needed. The cache is a dictionary private to the
+    caller that holds the objects resolved for each path and for their
+    parents.
+    """
+    if cache is not None:
+        out = cache.get(path, _MISSING)
+        if out is not _MISSING:
+            return out
+
+    module_name, _, qualname = path.partition(':')
+    if qualname:
+        parent, _, name = qualname.rpartition('.')
+        parent_path = ('{}:{}'.format(module_name, parent) if parent
+                       else module_name)
+        out = get_attribute(_resolve_path(parent_path, cache), name)
+    else:
+        out = importlib.import_module(module_name)
+
+    if cache is not None:
+        cache[path] = out
+
+    return out
+
+
+def _resolve_imported_destination(patch):
+    """Resolve the destination of a patch without importing any module.
+
+    The destination is returned as is if it isn't described by a path.
+    """
+    if not isinstance(patch.destination, _STRING_TYPES):
+        return patch.destination
+
+    module_name = patch.destination.partition(':')[0]
+    if module_name not in sys.modules:
+        raise ValueError(
+            "The target of the class '{}' can't be resolved since the module "
+            "'{}' of the destination is not imported yet. Import it "
+            "beforehand or set 'recursive' to False."
+            .format(patch.name, module_name))
+
+    return _resolve_path(patch.destination)
+
+
+def _get_path(obj):
+    """Retrieve the path ``'module:qualname'`` of an object, if any.
+
+    ``None`` is returned if the object can't be retrieved back from its path.
+    """
+    if isinstance(obj, types.ModuleType):
+        return obj.__name__
+
+    base = _get_base(obj)
+    module_name = getattr(base, '__module__', None)
+    qualname = getattr(base, '__qualname__', getattr(base, '__name__', None))
+    if not (isinstance(module_name, _STRING_TYPES)
+            and isinstance(qualname, _STRING_TYPES)):
+        return None
+
+    path = '{}:{}'.format(module_name, qualname)
+    try:
+        if _resolve_path(path) is obj:
+            return path
+    except (ImportError, AttributeError):
+        pass
+
+    return None
+
+
+def _defer(patch, patch_id):
+    """Defer a patch until its destination module is imported.
+
+    Nothing is done if the module is already imported, in which case the
+    output is ``False``.
+    """
+    module_name = patch.destination.partition(':')[0]
+    if module_name in sys.modules:
+        return False
+
+    if not _DEFERRED:
+        sys.meta_path.insert(0, _ImportHook)
+
+    _DEFERRED.setdefault(module_name, []).append((patch, patch_id))
+    return True
+
+
+def _is_deferred(patch):
+    """Check whether a patch is deferred."""
+    module_name = patch.destination.partition(':')[0]
+    return any(deferred_patch is patch
+               for deferred_patch, _ in _DEFERRED.get(module_name, ()))
+
+
+def _discard_deferred(patch):
+    """Discard a deferred patch.
+
+    The output is ``False`` if the patch was not deferred.
+    """
+    module_name = patch.destination.partition(':')[0]
+    deferred = _DEFERRED.get(module_name, [])
+    for i, (deferred_patch, _) in enumerate(deferred):
+        if deferred_patch is patch:
+            del deferred[i]
+            if not deferred:
+                _pop_deferred(module_name)
+
+            return True
+
+    return False
+
+
+def _discard_deferred_id(patch_id):
+    """Discard the patches deferred under a given identifier."""
+    for module_name, deferred in list(_iteritems(_DEFERRED)):
+        deferred[:] = [item for item in deferred if item[1] != patch_id]
+        if not deferred:
+            _pop_deferred(module_name)
+
+
+def _pop_deferred(module_name):
+    """Remove the patches deferred for a module.
+
+    The import hook is removed when no patch is left deferred.
+    """
+    deferred = _DEFERRED.pop(module_name, [])
+    if not _DEFERRED and _ImportHook in sys.meta_path:
+        sys.meta_path.remove(_ImportHook)
+
+    return deferred
+
+
+def _apply_deferred(module_name):
+    """Apply the patches deferred for a module that has been imported.
+
+    A patch failing to apply, for example because of a conflict, doesn't fail
+    the import of the module. Instead, a warning is issued and the patch is
+    kept deferred until the module is imported again.
+    """
+    failed = []
+    for patch, patch_id in _pop_deferred(module_name):
+        try:
+            apply(_resolve_patch(patch), id=patch_id)
+        except Exception as e:
+            failed.append((patch, patch_id))
+            warnings.warn(
+                "The deferred patch {!r} could not be applied: {}"
+                .format(patch, e), RuntimeWarning)
+
+    if failed:
+        if not _DEFERRED:
+            sys.meta_path.insert(0, _ImportHook)
+
+        _DEFERRED[module_name] = failed
+
+
+class _ImportHook(object):
+    """Meta path finder applying the deferred patches of imported modules.
+
+    The patches deferred for a module are applied once it is imported. The
+    module is found and loaded by the next finders of ``sys.meta_path``,
+    only its loader is wrapped.
+    """
+
+    # Names of the modules being loaded through the hook, on Python 2.
+    _loading = set()
+
+    @classmethod
+    def find_spec(cls, fullname, path=None, target=None):
+        if fullname not in _DEFERRED:
+            return None
+
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, 'find_spec', None)
+            if finder is cls or find_spec is None:
+                continue
+
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if hasattr(spec.loader, 'exec_module'):
+            spec.loader = _PostImportLoader(spec.loader)
+
+        return spec
+
+    @classmethod
+    def find_module(cls, fullname, path=None):
+        if fullname not in _DEFERRED or fullname in cls._loading:
+            return None
+
+        return cls
+
+    @classmethod
+    def load_module(cls, fullname):
+        cls._loading.add(fullname)
+        try:
+            module = importlib.import_module(fullname)
+        finally:
+            cls._loading.discard(fullname)
+
+        _apply_deferred(fullname)
+        return module
+
+
+class _PostImportLoader(object):
+    """Loader applying the deferred patches of a module after executing it.
+
+    The wrapped loader is restored onto the module before executing it.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        create_module = getattr(self.loader, 'create_module', None)
+        if create_module is None:
+            return None
+
+        return create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self.loader
+        if getattr(module, '__spec__', None) is not None:
+            module.__spec__.loader = self.loader
+
+        self.loader.exec_module(module)
+        _apply_deferred(module.__name__)
 
 
 def _true(*args, **kwargs):
@@ -62,6 +62,8 @@ setuptools.setup(
         'dev': ['coverage', 'pycodestyle', 'pydocstyle', 'pylint',
                 'sphinx>=1.3', 'tox'],
         'docs': ['sphinx>=1.3'],
+        'entry-points': ["importlib_metadata; python_version < '3.8'"],
+        'toml': ["tomli; python_version < '3.11'"],
     },
     packages=[],
     py_modules=['gorilla'],
@@ -138,3 +138,16 @@ def stack_1():
 def stack_2():
     original = gorilla.get_original_attribute(tests.core.tomodule, 'stack', id='second')()
     return original + ("red",)
+
+
+def call_through(__original__=None):
+    return __original__() + ("green",)
+
+
+@classmethod
+def call_through_class_method(cls, __original__=None):
+    return __original__(cls) + " (call_through_class_method)"
+
+
+def call_through_white(__original__=None):
+    return __original__() + ("white",)
@@ -9,10 +9,15 @@ from __future__ import (
 )
 
 import collections
+import copy
+import gc
 import importlib
 import itertools
 import os
+import pickle
 import sys
+import warnings
+import weakref
 
 _HERE = os.path.abspath(os.path.dirname(__file__))
 sys.path.insert(0, os.path.abspath(os.path.join(_HERE, os.pardir)))
@@ -25,6 +30,14 @@ import tests.core.tomodule as _tomodule
 from tests._testcase import GorillaTestCase
 
 
+if sys.version_info[0] == 2:
+    def _unfold(obj):
+        return obj.__func__
+else:
+    def _unfold(obj):
+        return obj
+
+
 _MODULES = [
     ('_core', _core.__name__),
     ('_frommodule', _frommodule.__name__),
@@ -96,6 +109,17 @@ class CoreTest(GorillaTestCase):
 
         settings_2.some_value = 123
         self.assertEqual(settings_1, settings_2)
+        self.assertEqual(copy.deepcopy(settings_1), settings_1)
+        self.assertEqual(repr(settings_1), "Settings(allow_hit=True, some_value=123, store_hit=True)")
+        self.assertEqual(hash(settings_1), hash(settings_2))
+        self.assertEqual(len({settings_1, settings_2, gorilla.Settings()}), 2)
+
+        settings_3 = gorilla._share_settings(gorilla.Settings(allow_hit=True))
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(settings_1, protocol)), settings_1)
+            settings_4 = pickle.loads(pickle.dumps(settings_3, protocol))
+            self.assertEqual(settings_4, settings_3)
+            settings_4.store_hit = False
 
     def test_patch(self):
         patch_1 = gorilla.Patch(_tomodule, 'dummy', _frommodule.function)
@@ -114,6 +138,17 @@ class CoreTest(GorillaTestCase):
 
         patch_2.some_value = 123
         self.assertEqual(patch_1, patch_2)
+        self.assertEqual(copy.copy(patch_1), patch_1)
+        self.assertEqual(hash(patch_1), hash(patch_2))
+
+        patch_3 = gorilla.Patch(_tomodule, 'function', [], settings=gorilla.Settings())
+        self.assertEqual(len({patch_1, patch_2, patch_3}), 2)
+        self.assertEqual({patch_1: 1}[patch_2], 1)
+
+        patch_4 = gorilla.Patch('tests.core.tomodule', 'function', _frommodule.function)
+        patch_4._update(settings={'allow_hit': True}, some_value=123)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(patch_4, protocol)), patch_4)
 
     def test_apply_patch_no_hit(self):
         name = 'dummy'
@@ -422,6 +457,444 @@ class CoreTest(GorillaTestCase):
 
         self.tearDown()
 
+    def test_ledger(self):
+        self.setUp()
+
+        settings = gorilla.Settings(allow_hit=True)
+        patches = [
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function, settings=settings),
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.global_variable, settings=settings),
+            gorilla.Patch(_tomodule.Class, 'method', _frommodule.unbound_method, settings=settings),
+        ]
+        for patch in patches:
+            gorilla.apply(patch)
+
+        self.assertEqual([name for name in vars(_tomodule) if name.startswith('_gorilla_')], [gorilla._LEDGER_RECORD])
+        self.assertEqual([name for name in vars(_tomodule.Class) if name.startswith('_gorilla_')], [gorilla._LEDGER_RECORD])
+        self.assertIs(gorilla.get_original_attribute(_tomodule, 'dummy'), _frommodule.function)
+        self.assertIs(gorilla.get_attribute(_tomodule.Class, 'method'), _frommodule.unbound_method)
+        self.assertEqual(gorilla.get_original_attribute(_tomodule.Class(), 'method')(), "tomodule.Class.method (tomodule.Class.STATIC_VALUE, tomodule.Class.instance_value)")
+
+        gorilla.revert(patches[2])
+        gorilla.revert(patches[1])
+        self.assertIs(_tomodule.dummy, _frommodule.function)
+        gorilla.revert(patches[0])
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+        self.assertRaises(RuntimeError, gorilla.revert, patches[0])
+        self.assertNotIn(id(_tomodule), gorilla._LEDGER)
+        self.assertNotIn(id(_tomodule.Class), gorilla._LEDGER)
+
+        destination = type(str('Destination'), (object,), {'method': _frommodule.unbound_method})
+        gorilla.apply(gorilla.Patch(destination, 'method', _frommodule.function, settings=settings))
+        self.assertIn(id(destination), gorilla._LEDGER)
+        key = id(destination)
+        del destination
+        gc.collect()
+        self.assertNotIn(key, gorilla._LEDGER)
+
+        # The original method references its class through 'super()'.
+        def make_destination():
+            class Destination(_frommodule.Parent):
+                def method(self):
+                    return super(Destination, self).method()
+
+            return Destination
+
+        destination = make_destination()
+        gorilla.apply(gorilla.Patch(destination, 'method', _frommodule.function, settings=settings), id='super')
+        self.assertIn(id(destination), gorilla._LEDGER)
+        ref = weakref.ref(destination)
+        del destination
+        gc.collect()
+        self.assertIsNone(ref())
+        self.assertNotIn('super', gorilla._LEDGER_IDS)
+
+        self.tearDown()
+
+    def test_call_through(self):
+        self.setUp()
+
+        settings = gorilla.Settings(allow_hit=True)
+        patch = gorilla.Patch(_tomodule, 'stack', _frommodule.call_through, settings=settings)
+        gorilla.apply(patch)
+        self.assertEqual(_tomodule.stack(), ("blue", "green"))
+        self.assertIsNot(_tomodule.stack, _frommodule.call_through)
+        self.assertEqual(_tomodule.stack.__name__, 'call_through')
+        self.assertRaises(TypeError, _frommodule.call_through)
+
+        gorilla.apply(patch)
+        self.assertEqual(_tomodule.stack(), ("blue", "green", "green"))
+
+        gorilla.revert(patch)
+        gorilla.revert(patch)
+        self.assertEqual(_tomodule.stack(), ("blue",))
+
+        obj = gorilla.get_attribute(_frommodule, 'call_through_class_method')
+        patch = gorilla.Patch(_tomodule.Class, 'class_method', obj, settings=settings)
+        gorilla.apply_all([patch])
+        self.assertEqual(_tomodule.Class.class_method(), "tomodule.Class.class_method (tomodule.Class.STATIC_VALUE) (call_through_class_method)")
+
+        patch = gorilla.Patch(_tomodule, 'dummy', _frommodule.call_through, settings=settings)
+        gorilla.apply(patch)
+        self.assertIs(_tomodule.dummy, _frommodule.call_through)
+
+        self.tearDown()
+
+    def test_revert_all(self):
+        self.setUp()
+
+        settings = gorilla.Settings(allow_hit=True)
+        patches = [
+            gorilla.Patch(_tomodule, 'stack', _frommodule.call_through, settings=settings),
+            gorilla.Patch(_tomodule, 'stack', _frommodule.call_through_white, settings=settings),
+            gorilla.Patch(_tomodule, 'stack', _frommodule.call_through, settings=settings),
+        ]
+        for patch in patches:
+            gorilla.apply(patch)
+
+        self.assertEqual(_tomodule.stack(), ("blue", "green", "white", "green"))
+
+        gorilla.revert_all([patches[1]])
+        self.assertEqual(_tomodule.stack(), ("blue", "green", "green"))
+        self.assertRaises(RuntimeError, gorilla.revert_all, [patches[2], patches[1]])
+        self.assertEqual(_tomodule.stack(), ("blue", "green", "green"))
+
+        gorilla.revert_all([patches[0], patches[2]])
+        self.assertEqual(_tomodule.stack(), ("blue",))
+        self.assertNotIn(id(_tomodule), gorilla._LEDGER)
+
+        patches = [
+            gorilla.Patch(_tomodule, 'dummy', _tomodule.stack),
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.call_through, settings=settings),
+        ]
+        gorilla.apply_all(patches)
+        self.assertEqual(_tomodule.dummy(), ("blue", "green"))
+
+        gorilla.revert_all([patches[0]])
+        self.assertIs(_tomodule.dummy, _frommodule.call_through)
+
+        gorilla.revert_all([patches[1]])
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+        self.assertNotIn(id(_tomodule), gorilla._LEDGER)
+
+        function = _frommodule.function
+        self.tearDown()
+
+        path = _tomodule.__name__
+        patches = [
+            gorilla.Patch(path, 'dummy', function),
+            gorilla.Patch(_frommodule, 'dummy', function),
+        ]
+        gorilla.apply(patches[0])
+        self.assertRaises(RuntimeError, gorilla.revert_all, patches)
+        self.assertIn(path, gorilla._DEFERRED)
+
+        gorilla.revert_all(patches[:1])
+        self.assertNotIn(path, gorilla._DEFERRED)
+
+        self.tearDown()
+
+    def test_revert_id(self):
+        self.setUp()
+
+        settings = gorilla.Settings(allow_hit=True)
+        gorilla.apply(gorilla.Patch(_tomodule, 'stack', _frommodule.call_through, settings=settings), id='first')
+        gorilla.apply(gorilla.Patch(_tomodule, 'stack', _frommodule.call_through_white, settings=settings), id='second')
+        gorilla.apply(gorilla.Patch(_tomodule, 'stack', _frommodule.call_through, settings=settings), id='first')
+        gorilla.apply(gorilla.Patch(_tomodule.Class, 'dummy', _frommodule.function), id='first')
+        self.assertEqual(_tomodule.stack(), ("blue", "green", "white", "green"))
+
+        gorilla.revert_id('first')
+        self.assertEqual(_tomodule.stack(), ("blue", "white"))
+        self.assertRaises(AttributeError, getattr, _tomodule.Class, 'dummy')
+        self.assertNotIn('first', gorilla._LEDGER_IDS)
+
+        gorilla.revert_id('second')
+        self.assertEqual(_tomodule.stack(), ("blue",))
+        self.assertNotIn('second', gorilla._LEDGER_IDS)
+        self.assertNotIn(id(_tomodule), gorilla._LEDGER)
+
+        function = _frommodule.function
+        self.tearDown()
+
+        path = _tomodule.__name__
+        gorilla.apply(gorilla.Patch(path, 'dummy', function), id='first')
+        gorilla.apply(gorilla.Patch(path + ':Class', 'dummy', function), id='second')
+        gorilla.revert_id('first')
+        self.assertIn(gorilla._ImportHook, sys.meta_path)
+
+        self.setUp()
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+        self.assertIs(gorilla.get_attribute(_tomodule.Class, 'dummy'), function)
+
+        gorilla.revert_id('second')
+        self.tearDown()
+
+    def test_snapshot(self):
+        self.setUp()
+
+        destinations = [_tomodule, _tomodule.Class]
+        attributes = [dict(vars(destination)) for destination in destinations]
+        snapshot = gorilla.snapshot(destinations)
+
+        settings = gorilla.Settings(allow_hit=True)
+        gorilla.apply_all([
+            gorilla.Patch(_tomodule, 'stack', _frommodule.call_through, settings=settings),
+            gorilla.Patch(_tomodule, 'stack', _frommodule.call_through_white, settings=settings),
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function),
+            gorilla.Patch(_tomodule.Class, 'method', _frommodule.unbound_method, settings=settings),
+            gorilla.Patch(_tomodule.Class, 'STATIC_VALUE', "dummy", settings=settings),
+        ])
+        gorilla.get_decorator_data(_tomodule.Class, set_default=True)
+        self.assertEqual(_tomodule.stack(), ("blue", "green", "white"))
+
+        gorilla.restore(snapshot)
+        self.assertEqual([dict(vars(destination)) for destination in destinations], attributes)
+        self.assertEqual(_tomodule.stack(), ("blue",))
+        self.assertIsNone(gorilla.get_decorator_data(_tomodule.Class))
+        self.assertNotIn(id(_tomodule), gorilla._LEDGER)
+        self.assertNotIn(id(_tomodule.Class), gorilla._LEDGER)
+
+        gorilla.apply(gorilla.Patch(_tomodule, 'stack', _frommodule.call_through, settings=settings))
+        snapshot = gorilla.snapshot([_tomodule])
+        gorilla.revert(gorilla.Patch(_tomodule, 'stack', _frommodule.call_through))
+        gorilla.restore(snapshot)
+        self.assertEqual(_tomodule.stack(), ("blue", "green"))
+        self.assertEqual(gorilla.get_original_attribute(_tomodule, 'stack')(), ("blue",))
+
+        self.tearDown()
+
+    def test_apply_all(self):
+        self.setUp()
+
+        settings = gorilla.Settings(allow_hit=True)
+        patches = [
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function, settings=settings),
+            gorilla.Patch(_tomodule, 'global_variable', _frommodule.global_variable, settings=settings),
+            gorilla.Patch(_tomodule.Class, 'method', _frommodule.Class.__dict__['method'], settings=settings),
+            gorilla.Patch(_tomodule.Class, 'dummy', _frommodule.global_variable),
+            gorilla.Patch(_tomodule.Parent, 'method', _frommodule.Parent.__dict__['method'], settings=settings),
+            gorilla.Patch(_tomodule.Child, 'method', _frommodule.unbound_method, settings=settings),
+        ]
+        gorilla.apply_all(patches)
+
+        self.assertIs(_tomodule.dummy, _frommodule.function)
+        self.assertEqual(_tomodule.global_variable, "frommodule.global_variable")
+        self.assertEqual(gorilla.get_original_attribute(_tomodule, 'global_variable'), "tomodule.global_variable")
+        self.assertIs(gorilla.get_attribute(_tomodule.Class, 'method'), _frommodule.Class.__dict__['method'])
+        self.assertEqual(_tomodule.Class.dummy, "frommodule.global_variable")
+        self.assertIs(gorilla.get_attribute(_tomodule.Child, 'method'), _frommodule.unbound_method)
+        self.assertIs(_unfold(gorilla.get_original_attribute(_tomodule.Child, 'method')), _frommodule.Parent.__dict__['method'])
+
+        for patch in reversed(patches):
+            gorilla.revert(patch)
+
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+        self.assertEqual(_tomodule.global_variable, "tomodule.global_variable")
+        self.assertEqual(_tomodule.Class().method(), "tomodule.Class.method (tomodule.Class.STATIC_VALUE, tomodule.Class.instance_value)")
+
+        self.tearDown()
+
+    def test_apply_all_stack(self):
+        self.setUp()
+
+        settings = gorilla.Settings(allow_hit=True)
+        patches = [
+            gorilla.Patch(_tomodule, 'stack', _frommodule.stack_1, settings=settings),
+            gorilla.Patch(_tomodule, 'stack', _frommodule.stack_2, settings=settings),
+        ]
+        gorilla.apply_all(patches[:1], id='first')
+        gorilla.apply_all(patches[1:], id='second')
+        self.assertEqual(_tomodule.stack(), ("blue", "white", "red"))
+
+        self.tearDown()
+
+    def test_apply_all_with_hit(self):
+        self.setUp()
+
+        patches = [
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function),
+            gorilla.Patch(_tomodule, 'function', _frommodule.function),
+        ]
+        self.assertRaises(RuntimeError, gorilla.apply_all, patches)
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+
+        patches = [
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function),
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function),
+        ]
+        self.assertRaises(RuntimeError, gorilla.apply_all, patches)
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+
+        self.tearDown()
+
+    def test_apply_all_rollback(self):
+        class Meta(type):
+            def __setattr__(cls, name, value):
+                if value == "fail":
+                    raise ValueError(name)
+
+                type.__setattr__(cls, name, value)
+
+        destination = Meta(str('Destination'), (object,), {'a': "fail", 'b': 0})
+        settings = gorilla.Settings(allow_hit=True)
+        patches = [
+            gorilla.Patch(destination, 'a', 1, settings=settings),
+            gorilla.Patch(destination, 'b', "fail", settings=settings),
+        ]
+        with self.assertRaises(ValueError) as context:
+            gorilla.apply_all(patches)
+
+        self.assertEqual(context.exception.args, ('b',))
+        self.assertEqual(destination.b, 0)
+        self.assertNotIn(id(destination), gorilla._LEDGER)
+
+    def test_check(self):
+        self.setUp()
+
+        settings = gorilla.Settings(allow_hit=True)
+        patches = [
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function),
+            gorilla.Patch(_tomodule, 'function', _frommodule.function),
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function, settings=settings),
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.unbound_method),
+            gorilla.Patch(_tomodule, 'global_variable', _frommodule.global_variable, settings=settings),
+            gorilla.Patch(_tomodule.Parent, 'dummy', _frommodule.function),
+            gorilla.Patch(_tomodule.Child, 'dummy', _frommodule.function),
+            gorilla.Patch('tests.core.tomodule:Class', 'method', _frommodule.function),
+        ]
+        conflicts = gorilla.check(patches)
+        self.assertEqual([(conflict.kind, conflict.patch, conflict.other) for conflict in conflicts], [
+            ('hit', patches[1], None),
+            ('duplicate', patches[2], patches[0]),
+            ('order', patches[3], patches[0]),
+            ('order', patches[6], patches[5]),
+            ('hit', patches[7], None),
+        ])
+        self.assertEqual(str(conflicts[0]), "The patch of the attribute named 'function' at the destination 'tests.core.tomodule' hits an existing attribute.")
+        self.assertEqual(gorilla.PatchSet(patches[4:6]).check(), [])
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+
+        self.tearDown()
+
+    def test_patch_set(self):
+        self.setUp()
+
+        settings = gorilla.Settings(allow_hit=True)
+        patch_set = gorilla.PatchSet([
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function),
+            gorilla.Patch(_tomodule, 'global_variable', _frommodule.global_variable, settings=settings),
+            gorilla.Patch(_tomodule.Class, 'method', _frommodule.Class.__dict__['method'], settings=settings),
+        ])
+        self.assertFalse(patch_set.applied)
+
+        patch_set.apply()
+        self.assertTrue(patch_set.applied)
+        self.assertRaises(RuntimeError, patch_set.apply)
+        self.assertIs(_tomodule.dummy, _frommodule.function)
+        self.assertEqual(_tomodule.global_variable, "frommodule.global_variable")
+        self.assertEqual(gorilla.get_original_attribute(_tomodule, 'global_variable'), "tomodule.global_variable")
+        self.assertIs(gorilla.get_attribute(_tomodule.Class, 'method'), _frommodule.Class.__dict__['method'])
+
+        patch_set.revert()
+        self.assertFalse(patch_set.applied)
+        self.assertRaises(RuntimeError, patch_set.revert)
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+        self.assertEqual(_tomodule.global_variable, "tomodule.global_variable")
+        self.assertRaises(AttributeError, gorilla.get_original_attribute, _tomodule, 'global_variable')
+        self.assertEqual(_tomodule.Class().method(), "tomodule.Class.method (tomodule.Class.STATIC_VALUE, tomodule.Class.instance_value)")
+        self.assertEqual([name for name in vars(_tomodule) if name.startswith('_gorilla_')], [])
+        self.assertEqual([name for name in vars(_tomodule.Class) if name.startswith('_gorilla_')], [])
+
+        with patch_set:
+            self.assertIs(_tomodule.dummy, _frommodule.function)
+
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+
+        self.tearDown()
+
+    def test_patch_set_with_hit(self):
+        self.setUp()
+
+        patch_set = gorilla.PatchSet([
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function),
+            gorilla.Patch(_tomodule.Class, 'dummy', _frommodule.function),
+            gorilla.Patch(_tomodule, 'function', _frommodule.function),
+        ])
+        self.assertRaises(RuntimeError, patch_set.apply)
+        self.assertFalse(patch_set.applied)
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+        self.assertRaises(AttributeError, getattr, _tomodule.Class, 'dummy')
+
+        self.tearDown()
+
+    def test_patch_set_rollback(self):
+        self.setUp()
+
+        patch_set = gorilla.PatchSet([
+            gorilla.Patch(_tomodule, 'dummy', _frommodule.function),
+            gorilla.Patch(object, 'dummy', _frommodule.function),
+        ])
+        self.assertRaises(TypeError, patch_set.apply)
+        self.assertFalse(patch_set.applied)
+        self.assertRaises(AttributeError, getattr, _tomodule, 'dummy')
+        self.assertEqual([name for name in vars(_tomodule) if name.startswith('_gorilla_')], [])
+
+        self.tearDown()
+
+    def test_deferred_patch(self):
+        function = _frommodule.function
+        self.tearDown()
+
+        path = _tomodule.__name__
+        patch_1 = gorilla.Patch(path, 'dummy', function)
+        patch_2 = gorilla.Patch(path + ':Class', 'dummy', function)
+        patch_3 = gorilla.Patch(path + ':Class.Inner', 'dummy', function)
+        gorilla.apply(patch_1)
+        gorilla.apply_all([patch_2, patch_3])
+        self.assertNotIn(path, sys.modules)
+        self.assertIn(gorilla._ImportHook, sys.meta_path)
+
+        gorilla.revert(patch_3)
+        self.assertNotIn(path, sys.modules)
+
+        self.setUp()
+        self.assertNotIn(gorilla._ImportHook, sys.meta_path)
+        self.assertIs(_tomodule.dummy, function)
+        self.assertIs(gorilla.get_attribute(_tomodule.Class, 'dummy'), function)
+        self.assertRaises(AttributeError, getattr, _tomodule.Class.Inner, 'dummy')
+        if sys.version_info[0] != 2:
+            self.assertEqual(type(_tomodule.__loader__).__name__, 'SourceFileLoader')
+
+        gorilla.revert(patch_2)
+        self.assertRaises(AttributeError, getattr, _tomodule.Class, 'dummy')
+
+        patch_4 = gorilla.Patch(path + ':Class', 'dummy', function)
+        gorilla.apply(patch_4)
+        self.assertIs(gorilla.get_attribute(_tomodule.Class, 'dummy'), function)
+
+        self.tearDown()
+
+    def test_deferred_patch_conflict(self):
+        function = _frommodule.function
+        self.tearDown()
+
+        path = _tomodule.__name__
+        patch = gorilla.Patch(path, 'function', function)
+        gorilla.apply(patch)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.setUp()
+
+        self.assertEqual([warning.category for warning in caught], [RuntimeWarning])
+        self.assertIsNot(_tomodule.function, function)
+        self.assertIn(path, gorilla._DEFERRED)
+        self.assertIn(gorilla._ImportHook, sys.meta_path)
+
+        gorilla.revert(patch)
+        self.assertNotIn(path, gorilla._DEFERRED)
+        self.assertNotIn(gorilla._ImportHook, sys.meta_path)
+
 
 if __name__ == '__main__':
     from tests.run import run
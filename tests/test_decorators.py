@@ -8,6 +8,7 @@ from __future__ import (
     unicode_literals,
 )
 
+import copy
 import importlib
 import os
 import sys
@@ -207,6 +208,16 @@ class DecoratorsTest(GorillaTestCase):
         ]
         self.assertEqual(decorator_data.patches, expected_patches)
 
+        patches = decorator_data.patches
+        self.assertIs(patches[0].settings, patches[1].settings)
+        self.assertIs(patches[0].settings, patches[5].settings)
+        self.assertIsNot(patches[0].settings, patches[2].settings)
+        self.assertRaises(AttributeError, setattr, patches[0].settings, 'allow_hit', False)
+
+        settings = copy.copy(patches[0].settings)
+        settings.allow_hit = False
+        self.assertEqual(settings, gorilla.Settings(store_hit=False))
+
     def test_filter_decorator(self):
         destination = _tomodule.Class
         obj = _frommodule.Class
@@ -8,9 +8,16 @@ from __future__ import (
     unicode_literals,
 )
 
+import gc
 import importlib
+import inspect
+import json
 import os
+import shutil
 import sys
+import tempfile
+import unittest
+import weakref
 
 _HERE = os.path.abspath(os.path.dirname(__file__))
 sys.path.insert(0, os.path.abspath(os.path.join(_HERE, os.pardir)))
@@ -314,6 +321,30 @@ class UtilsTest(GorillaTestCase):
 
         self.assertEqual(patches, expected_patches)
 
+    def test_iter_create_patches(self):
+        destination = _tomodule.Class
+        obj = _frommodule.Class
+        expected_patches = gorilla.create_patches(destination, obj)
+        iterator = gorilla.iter_create_patches(destination, obj)
+        self.assertEqual(next(iterator), expected_patches[0])
+        self.assertEqual(list(iterator), expected_patches[1:])
+
+    def test_create_patches_path(self):
+        for destination, obj in [(_tomodule, _frommodule), (_tomodule.Class, _frommodule.Class)]:
+            path = gorilla._get_path(destination)
+            expected_patches = gorilla.create_patches(destination, obj)
+            for patch in expected_patches:
+                if patch.destination is destination:
+                    patch.destination = path
+
+            self.assertEqual(gorilla.create_patches(path, obj), expected_patches)
+
+        path = _tomodule.__name__
+        self.tearDown()
+        self.assertRaises(ValueError, gorilla.create_patches, path, _frommodule)
+        self.assertEqual(len(gorilla.create_patches(path, _frommodule, recursive=False)), len(gorilla.create_patches(_tomodule, _frommodule, recursive=False)))
+        self.setUp()
+
     def test_find_patches_1(self):
         patches = gorilla.find_patches([_utils])
         expected_patches = [
@@ -352,6 +383,9 @@ class UtilsTest(GorillaTestCase):
         ]
         self.assertEqual(patches, expected_patches)
 
+        patches = gorilla.find_patches([_utils], recursive=False, unique=True)
+        self.assertEqual(patches, expected_patches[:-1])
+
     def test_find_patches_2(self):
         global _utils
         self.tearDown()
@@ -396,6 +430,330 @@ class UtilsTest(GorillaTestCase):
         ]
         self.assertEqual(patches, expected_patches)
 
+    def test_find_patches_deferred(self):
+        function = _frommodule.function
+        path = _module2.__name__
+        self.tearDown()
+
+        patch = gorilla.Patch(path, 'dummy', function)
+        gorilla.apply(patch)
+        self.assertIn(path, gorilla._DEFERRED)
+
+        gorilla.find_patches([importlib.import_module(_utils.__name__)])
+        self.assertNotIn(gorilla._ImportHook, sys.meta_path)
+        self.assertIs(sys.modules[path].dummy, function)
+
+        self.setUp()
+
+    def test_find_patches_cache(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache = os.path.join(directory, 'cache.json')
+            expected_patches = gorilla.find_patches([_utils])
+            patches = gorilla.find_patches([_utils], cache=cache)
+            self.assertEqual(patches, expected_patches)
+            self.assertTrue(os.path.exists(cache))
+
+            with open(cache, 'r') as f:
+                entries = json.load(f)['entries']
+
+            self.assertEqual(entries['tests.utils.nopatches']['members'], [])
+            self.assertEqual(entries['tests.utils.subpackage.module1']['members'], [['function'], ['unbound_class_method'], ['unbound_method'], ['unbound_static_method'], ['Class', 'method'], ['Class', 'value']])
+
+            sys.modules.pop('tests.utils.nopatches', None)
+            patches = gorilla.find_patches([_utils], cache=cache)
+            self.assertEqual(patches, expected_patches)
+            self.assertNotIn('tests.utils.nopatches', sys.modules)
+
+            patches = gorilla.find_patches([_utils], recursive=False, cache=cache)
+            self.assertEqual(patches, gorilla.find_patches([_utils], recursive=False))
+
+            entries['tests.utils.frommodule']['stamp'] = [0, 0]
+            entries['tests.utils.subpackage.module1']['members'] = [['missing']]
+            with open(cache, 'w') as f:
+                json.dump({'version': 1, 'entries': entries}, f)
+
+            patches = gorilla.find_patches([_utils], cache=cache)
+            self.assertEqual(patches, expected_patches)
+
+            with open(cache, 'w') as f:
+                f.write('invalid')
+
+            patches = gorilla.find_patches([_utils], cache=cache)
+            self.assertEqual(patches, expected_patches)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_find_patches_not_recursive(self):
+        global _utils
+        self.tearDown()
+        _utils = importlib.import_module(_utils.__name__)
+
+        gorilla.find_patches([_utils], recursive=False)
+        self.assertNotIn(_subpackage.__name__, sys.modules)
+        self.setUp()
+
+    def test_find_patches_workers(self):
+        global _utils
+        self.tearDown()
+        _utils = importlib.import_module(_utils.__name__)
+
+        patches = gorilla.find_patches([_utils], workers=4)
+        self.assertEqual(patches, gorilla.find_patches([_utils]))
+        self.setUp()
+
+        directory = tempfile.mkdtemp()
+        try:
+            cache = os.path.join(directory, 'cache.json')
+            gorilla.find_patches([_utils], cache=cache)
+            self.tearDown()
+            _utils = importlib.import_module(_utils.__name__)
+
+            patches = gorilla.find_patches([_utils], cache=cache, static=True, workers=4)
+            self.assertEqual(patches, gorilla.find_patches([_utils]))
+            self.setUp()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_iter_patches(self):
+        global _utils
+        self.tearDown()
+        _utils = importlib.import_module(_utils.__name__)
+        self.setUp()
+
+        expected_patches = gorilla.find_patches([_utils])
+        iterator = gorilla.iter_patches([_utils])
+        self.assertEqual(next(iterator), expected_patches[0])
+        self.assertEqual(list(iterator), expected_patches[1:])
+        self.assertEqual(list(gorilla.iter_patches([_utils], unique=True)), gorilla.find_patches([_utils], unique=True))
+
+        directory = tempfile.mkdtemp()
+        try:
+            cache = os.path.join(directory, 'cache.json')
+            gorilla.find_patches([_utils], cache=cache)
+            with open(cache, 'r') as f:
+                entries = json.load(f)['entries']
+
+            patches = list(gorilla.iter_patches([_utils], cache=cache, release=True))
+            self.assertEqual(patches, expected_patches)
+            self.assertIsNone(gorilla.get_decorator_data(_module1.function))
+            self.assertIsNone(gorilla.get_decorator_data(_frommodule.Parent))
+            self.assertEqual([name for module in (_frommodule, _module1, _module2) for name in vars(module) if name.startswith('_gorilla_')], [])
+
+            self.assertEqual(gorilla.find_patches([_utils]), [])
+            self.assertEqual(gorilla.find_patches([_utils], cache=cache), [])
+            with open(cache, 'r') as f:
+                self.assertEqual(json.load(f)['entries'], entries)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_find_patches_static(self):
+        expected_patches = gorilla.find_patches([_utils])
+
+        sys.modules.pop('tests.utils.nopatches', None)
+        patches = gorilla.find_patches([_utils], static=True)
+        self.assertEqual(patches, expected_patches)
+        self.assertNotIn('tests.utils.nopatches', sys.modules)
+
+        patches = gorilla.find_patches([_utils], recursive=False, static=True)
+        self.assertEqual(patches, gorilla.find_patches([_utils], recursive=False))
+
+        sys.modules.pop('tests.utils.nopatches', None)
+        directory = tempfile.mkdtemp()
+        try:
+            cache = os.path.join(directory, 'cache.json')
+            patches = gorilla.find_patches([_utils], cache=cache, static=True)
+            self.assertEqual(patches, expected_patches)
+            self.assertNotIn('tests.utils.nopatches', sys.modules)
+
+            with open(cache, 'r') as f:
+                entries = json.load(f)['entries']
+
+            self.assertEqual(entries['tests.utils.nopatches']['members'], [])
+        finally:
+            shutil.rmtree(directory)
+
+    def test__refers_to_patch_decorators(self):
+        directory = tempfile.mkdtemp()
+        try:
+            sources = [
+                ("import gorilla\n@gorilla.patch(object)\ndef f(): pass\n", True),
+                ("import gorilla as g\n@g.patches(object)\nclass A(object): pass\n", True),
+                ("from gorilla import patch as p\np(object)(len)\n", True),
+                ("from gorilla import *\n@patch(object)\ndef f(): pass\n", True),
+                ("import gorilla\n@gorilla.name('g')\ndef f(): pass\n", False),
+                ("from gorilla import Patch\npatch = Patch\n", False),
+                ("import os\n# gorilla.patch\n", False),
+                ("import gorilla\ndef f(:\n", True),
+            ]
+            for i, (source, expected) in enumerate(sources):
+                path = os.path.join(directory, 'module{}.py'.format(i))
+                with open(path, 'w') as f:
+                    f.write(source)
+
+                self.assertEqual(gorilla._refers_to_patch_decorators(path), expected)
+        finally:
+            shutil.rmtree(directory)
+
+    @unittest.skipIf(gorilla._metadata is None, "requires importlib.metadata")
+    def test_find_entry_point_patches(self):
+        directory = tempfile.mkdtemp()
+        sys.path.insert(0, directory)
+        try:
+            path = os.path.join(directory, 'gorilla_plugin-1.0.dist-info')
+            os.mkdir(path)
+            with open(os.path.join(path, 'METADATA'), 'w') as f:
+                f.write("Metadata-Version: 2.1\nName: gorilla-plugin\nVersion: 1.0\n")
+
+            with open(os.path.join(path, 'entry_points.txt'), 'w') as f:
+                f.write("[gorilla.patches]\n"
+                        "b = tests.utils.subpackage.module1 : Class.method [extra]\n"
+                        "a = tests.utils.frommodule\n")
+
+            expected_patches = (
+                gorilla.find_patches([_frommodule])
+                + gorilla.get_decorator_data(gorilla.get_attribute(_module1.Class, 'method')).patches)
+            self.assertEqual(gorilla.find_entry_point_patches(), expected_patches)
+            self.assertEqual(gorilla.find_entry_point_patches(group='gorilla.other'), [])
+
+            cache = os.path.join(directory, 'cache.json')
+            self.assertEqual(gorilla.find_entry_point_patches(cache=cache), expected_patches)
+            with open(cache, 'r') as f:
+                entries = json.load(f)['entries']
+
+            self.assertEqual(entries[':gorilla.patches']['values'], ['tests.utils.frommodule', 'tests.utils.subpackage.module1:Class.method'])
+            self.assertIn('tests.utils.frommodule', entries)
+
+            metadata = gorilla._metadata
+            gorilla._metadata = None
+            try:
+                self.assertEqual(gorilla.find_entry_point_patches(cache=cache), expected_patches)
+                self.assertRaises(RuntimeError, gorilla.find_entry_point_patches)
+            finally:
+                gorilla._metadata = metadata
+        finally:
+            sys.path.remove(directory)
+            shutil.rmtree(directory)
+
+    def test_load_manifest(self):
+        expected_patches = [
+            gorilla.Patch('tests.utils.tomodule:Class', 'method', gorilla.get_attribute(_frommodule.Class, 'method'), settings=gorilla.Settings(allow_hit=True)),
+            gorilla.Patch('tests.utils.tomodule', 'function', _frommodule.function),
+        ]
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'manifest.json')
+            with open(path, 'w') as f:
+                json.dump({'patches': [
+                    {'destination': 'tests.utils.tomodule:Class', 'name': 'method', 'object': 'tests.utils.frommodule:Class.method', 'settings': {'allow_hit': True}},
+                    {'destination': 'tests.utils.tomodule', 'object': 'tests.utils.frommodule:function'},
+                ]}, f)
+
+            patches = gorilla.load_manifest(path)
+            self.assertEqual(patches, expected_patches)
+            self.assertIs(patches[0].settings, gorilla._share_settings(gorilla.Settings(allow_hit=True)))
+
+            if gorilla._toml is not None:
+                path = os.path.join(directory, 'manifest.toml')
+                with open(path, 'w') as f:
+                    f.write('[[patches]]\n'
+                            'destination = "tests.utils.tomodule:Class"\n'
+                            'name = "method"\n'
+                            'object = "tests.utils.frommodule:Class.method"\n'
+                            'settings = { allow_hit = true }\n'
+                            '\n'
+                            '[[patches]]\n'
+                            'destination = "tests.utils.tomodule"\n'
+                            'object = "tests.utils.frommodule:function"\n')
+
+                self.assertEqual(gorilla.load_manifest(path), expected_patches)
+
+            path = os.path.join(directory, 'invalid.json')
+            for data in ({'patches': {}}, {'patches': [{'object': 'tests.utils.frommodule:function'}]}, {'patches': [{'destination': 'tests.utils.tomodule', 'object': 'tests.utils.frommodule:function', 'unknown': True}]}):
+                with open(path, 'w') as f:
+                    json.dump(data, f)
+
+                self.assertRaises(ValueError, gorilla.load_manifest, path)
+        finally:
+            shutil.rmtree(directory)
+
+    @unittest.skipIf(sys.version_info[0] == 2, "requires Python 3")
+    def test_plan(self):
+        patches = gorilla.find_patches([_utils])
+        extra_patches = [
+            gorilla.Patch(_tomodule, 'dummy', None, settings=gorilla.Settings(allow_hit=True)),
+            gorilla.Patch('tests.utils.tomodule:Class', 'dummy', _frommodule.function),
+        ]
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'plan.json')
+            gorilla.compile_plan([gorilla.PatchSet(patches), gorilla.PatchSet(extra_patches, id='extra')], path)
+            patch_sets = gorilla.load_plan(path)
+            self.assertEqual([patch_set.id for patch_set in patch_sets], ['default', 'extra'])
+            self.assertEqual([gorilla._resolve_patch(patch) for patch in patch_sets[0].patches], patches)
+            self.assertEqual([gorilla._resolve_patch(patch) for patch in patch_sets[1].patches], [gorilla._resolve_patch(patch) for patch in extra_patches])
+            self.assertIs(patch_sets[1].patches[0].settings, gorilla._share_settings(gorilla.Settings(allow_hit=True)))
+
+            with open(path, 'r') as f:
+                data = json.load(f)
+
+            self.assertEqual(data['settings'], [None, {'allow_hit': True, 'store_hit': True}])
+            self.assertEqual(data['fingerprint']['tests.utils.frommodule'][0], _frommodule.__file__)
+
+            data['fingerprint']['tests.utils.frommodule'][1] = [0, 0]
+            with open(path, 'w') as f:
+                json.dump(data, f)
+
+            self.assertRaises(RuntimeError, gorilla.load_plan, path)
+
+            data['version'] = 0
+            with open(path, 'w') as f:
+                json.dump(data, f)
+
+            self.assertRaises(RuntimeError, gorilla.load_plan, path)
+
+            def function():
+                pass
+
+            patch_set = gorilla.PatchSet([gorilla.Patch(_tomodule, 'dummy', function)])
+            self.assertRaises(ValueError, gorilla.compile_plan, [patch_set], path)
+            patch_set = gorilla.PatchSet([gorilla.Patch(_tomodule, 'dummy', None, settings=gorilla.Settings(value=object()))])
+            self.assertRaises(ValueError, gorilla.compile_plan, [patch_set], path)
+            patch_set = gorilla.PatchSet([gorilla.Patch('tests.utils.dummy:Class', 'dummy', None)])
+            self.assertRaises(ValueError, gorilla.compile_plan, [patch_set], path)
+        finally:
+            shutil.rmtree(directory)
+
+    @unittest.skipIf(sys.version_info[0] == 2, "requires Python 3")
+    def test_plan_not_imported(self):
+        module_name = '_gorilla_plan_module'
+        directory = tempfile.mkdtemp()
+        sys.path.insert(0, directory)
+        try:
+            module_path = os.path.join(directory, module_name + '.py')
+            with open(module_path, 'w') as f:
+                f.write("class Class(object):\n    pass\n")
+
+            path = os.path.join(directory, 'plan.json')
+            patch_set = gorilla.PatchSet([gorilla.Patch(module_name + ':Class', 'dummy', None)])
+            gorilla.compile_plan([patch_set], path)
+            self.assertNotIn(module_name, sys.modules)
+
+            with open(path, 'r') as f:
+                data = json.load(f)
+
+            self.assertEqual(data['fingerprint'][module_name], [module_path, gorilla._get_file_stamp(module_path)])
+            self.assertEqual(len(gorilla.load_plan(path)), 1)
+
+            with open(module_path, 'a') as f:
+                f.write("\n\nvalue = 1\n")
+
+            self.assertRaises(RuntimeError, gorilla.load_plan, path)
+        finally:
+            sys.path.remove(directory)
+            sys.modules.pop(module_name, None)
+            shutil.rmtree(directory)
+
     def test_get_attribute(self):
         self.assertIs(gorilla.get_attribute(_frommodule.Class, 'STATIC_VALUE'), _frommodule.Class.__dict__['STATIC_VALUE'])
         self.assertIs(gorilla.get_attribute(_frommodule.Class, '__init__'), _frommodule.Class.__dict__['__init__'])
@@ -409,6 +767,12 @@ class UtilsTest(GorillaTestCase):
         self.assertIs(gorilla.get_attribute(_frommodule.Child, 'STATIC_VALUE'), _frommodule.Parent.__dict__['STATIC_VALUE'])
         self.assertIs(gorilla.get_attribute(_frommodule.Child, '__init__'), _frommodule.Child.__dict__['__init__'])
         self.assertIs(gorilla.get_attribute(_frommodule.Child, 'method'), _frommodule.Parent.__dict__['method'])
+        self.assertIs(gorilla.get_attribute(_frommodule, 'function'), _frommodule.__dict__['function'])
+        self.assertEqual(gorilla.get_attribute(_frommodule.Child, '__name__'), 'Child')
+        self.assertEqual(gorilla.get_attribute(_frommodule.Child(), 'instance_value'), _frommodule.Child().instance_value)
+        self.assertRaises(AttributeError, gorilla.get_attribute, _frommodule.Child, 'dummy')
+        self.assertRaises(AttributeError, gorilla.get_attribute, _frommodule.Child(), 'dummy')
+        self.assertRaises(AttributeError, gorilla.get_attribute, _frommodule, 'dummy')
 
     def test_get_original_attribute(self):
         destination = _tomodule.Class
@@ -420,6 +784,46 @@ class UtilsTest(GorillaTestCase):
 
         gorilla.apply(patch)
         self.assertIs(_unfold(gorilla.get_original_attribute(destination, name)), target)
+        self.assertEqual(gorilla.get_original_attribute(destination, name), gorilla.get_original_attribute(destination, name))
+
+        instance = destination()
+        self.assertIs(gorilla.get_original_attribute(instance, name).__self__, instance)
+
+        cls = type(str('Child'), (destination,), {})
+        self.assertIs(gorilla.get_original_attribute(cls(), name).__func__, target)
+        key = (id(cls), name, 'default')
+        self.assertIn(key, gorilla._ORIGINAL_CACHE)
+        ref = weakref.ref(cls)
+        del cls
+        gc.collect()
+        self.assertIsNone(ref())
+        self.assertNotIn(key, gorilla._ORIGINAL_CACHE)
+
+    def test_get_original_attribute_stack(self):
+        destination = _tomodule.Class
+        name = 'method'
+        target = gorilla.get_attribute(destination, name)
+        settings = gorilla.Settings(allow_hit=True)
+        objs = [gorilla.get_attribute(_frommodule, 'unbound_method'),
+                gorilla.get_attribute(_frommodule, 'function'),
+                gorilla.get_attribute(_frommodule.Class, 'method')]
+        patches = [gorilla.Patch(destination, name, obj, settings=settings)
+                   for obj in objs]
+
+        gorilla.apply(patches[0], id='first')
+        gorilla.apply(patches[1], id='second')
+        gorilla.apply(patches[2], id='first')
+        self.assertIs(_unfold(gorilla.get_original_attribute(destination, name, id='first')), objs[1])
+        self.assertIs(_unfold(gorilla.get_original_attribute(destination, name, id='second')), objs[0])
+        self.assertIs(gorilla.get_original_attribute(_tomodule.Class(), name, id='first').__func__, objs[1])
+        self.assertRaises(AttributeError, gorilla.get_original_attribute, destination, name, id='third')
+
+        gorilla.revert(patches[2])
+        self.assertIs(_unfold(gorilla.get_original_attribute(destination, name, id='first')), target)
+
+        gorilla.revert(patches[1])
+        gorilla.revert(patches[0])
+        self.assertRaises(AttributeError, gorilla.get_original_attribute, destination, name, id='first')
 
     def test__get_members_1(self):
         members = gorilla._get_members(_frommodule)
@@ -603,6 +1007,29 @@ class UtilsTest(GorillaTestCase):
         ]
         self.assertEqual(members, expected_members)
 
+    def test__get_members_cache(self):
+        obj = _frommodule.Child
+        members = gorilla._get_members(obj, recursive=False)
+        mro = inspect.getmro(obj)
+        self.assertIs(gorilla._get_class_layout(obj, mro, True), gorilla._get_class_layout(obj, mro, True))
+
+        patch = gorilla.Patch(_frommodule.Parent, 'dummy', _frommodule.function)
+        gorilla.apply(patch)
+        self.assertEqual(gorilla._get_members(obj, recursive=False), sorted(members + [('dummy', _frommodule.function)]))
+
+        gorilla.revert(patch)
+        self.assertEqual(gorilla._get_members(obj, recursive=False), members)
+
+        obj = type(str('Class'), (object,), {'value': 1})
+        self.assertIn(('value', 1), gorilla._get_members(obj, recursive=False))
+        key = (id(obj), True)
+        self.assertIn(key, gorilla._MEMBER_CACHE)
+        ref = weakref.ref(obj)
+        del obj
+        gc.collect()
+        self.assertIsNone(ref())
+        self.assertNotIn(key, gorilla._MEMBER_CACHE)
+
 
 if __name__ == '__main__':
     from tests.run import run
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+
+
+def function():
+    """nopatches.function"""
+    return "nopatches.function"